@@ -0,0 +1,566 @@
+"""Offline benchmarks for the bot's handlers.
+
+Runs main.py's commands and background passes against a local stand-in
+for the GitHub contents API and fake Discord objects, and reports latency
+and API-call counts at several event/member counts:
+
+    python benchmark.py
+    python benchmark.py --sizes 10 1000 --repeat 50 --discord-latency 5
+
+Nothing here talks to GitHub or Discord.
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+WEBHOOK_SECRET = "benchmark-secret"
+
+
+class FakeGitHub:
+    """In-memory GitHub contents API with blob SHA and ETag semantics."""
+
+    def __init__(self):
+        self.files = {}  # path -> raw bytes
+        self.blobs = {}  # sha -> raw bytes of every revision
+        self.calls = Counter()
+        self.app = web.Application(client_max_size=100 * 1024**2)
+        self.app.router.add_get("/repos/{owner}/{repo}/contents/{path}",
+                                self.get)
+        self.app.router.add_put("/repos/{owner}/{repo}/contents/{path}",
+                                self.put)
+        self.app.router.add_get("/repos/{owner}/{repo}/git/blobs/{sha}",
+                                self.blob)
+        self.runner = None
+        self.url = None
+
+    @staticmethod
+    def sha(raw):
+        return hashlib.sha1(b"blob %d\0" % len(raw) + raw).hexdigest()
+
+    def write(self, path, raw):
+        self.files[path] = raw
+        sha = self.sha(raw)
+        self.blobs[sha] = raw
+        return sha
+
+    async def get(self, request):
+        path = request.match_info["path"]
+        self.calls[("GET", path)] += 1
+        if path not in self.files:
+            return web.json_response({"message": "Not Found"}, status=404)
+        raw = self.files[path]
+        sha = self.sha(raw)
+        etag = f'"{sha}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(
+            {
+                "sha": sha,
+                "content": base64.b64encode(raw).decode()
+            },
+            headers={"ETag": etag})
+
+    async def blob(self, request):
+        sha = request.match_info["sha"]
+        self.calls[("GET", "blob")] += 1
+        if sha not in self.blobs:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return web.json_response({
+            "sha": sha,
+            "content": base64.b64encode(self.blobs[sha]).decode()
+        })
+
+    async def put(self, request):
+        path = request.match_info["path"]
+        self.calls[("PUT", path)] += 1
+        body = await request.json()
+        current = self.files.get(path)
+        if current is not None and body.get("sha") != self.sha(current):
+            status = 409 if body.get("sha") else 422
+            return web.json_response({"message": "sha mismatch"},
+                                     status=status)
+        sha = self.write(path, base64.b64decode(body["content"]))
+        return web.json_response({"content": {
+            "sha": sha
+        }},
+                                 status=200 if current else 201)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def send_push(url, secret, files, branch="main"):
+    """Deliver a signed GitHub push webhook that touched ``files``."""
+    body = json.dumps({
+        "ref": f"refs/heads/{branch}",
+        "commits": [{
+            "added": [],
+            "modified": list(files),
+            "removed": []
+        }]
+    }).encode()
+    signature = "sha256=" + hmac.new(secret.encode(), body,
+                                     hashlib.sha256).hexdigest()
+    headers = {
+        "X-GitHub-Event": "push",
+        "X-Hub-Signature-256": signature,
+        "Content-Type": "application/json"
+    }
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=body, headers=headers) as resp:
+            return resp.status
+
+
+class DiscordCalls(Counter):
+    """Counts simulated Discord REST calls and adds optional latency."""
+
+    latency = 0.0
+
+    async def hit(self, name):
+        self[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+discord_calls = DiscordCalls()
+
+
+class FakeRole:
+
+    def __init__(self, guild, role_id, name):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+        self.member_ids = set()
+
+    @property
+    def members(self):
+        return [self.guild.get_member(i) for i in self.member_ids]
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+
+class FakeMember:
+
+    def __init__(self, guild, member_id, bot=False):
+        self.guild = guild
+        self.id = member_id
+        self.bot = bot
+        self.name = self.display_name = f"member{member_id}"
+        self._roles = set()
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def roles(self):
+        return [self.guild.get_role(i) for i in self._roles]
+
+    def get_role(self, role_id):
+        return self.guild.get_role(role_id) if role_id in self._roles else None
+
+    async def add_roles(self, *roles, reason=None):
+        await discord_calls.hit("add_roles")
+        for role in roles:
+            self._roles.add(role.id)
+            role.member_ids.add(self.id)
+
+    async def remove_roles(self, *roles, reason=None):
+        await discord_calls.hit("remove_roles")
+        for role in roles:
+            self._roles.discard(role.id)
+            role.member_ids.discard(self.id)
+
+
+class FakeMessage:
+    next_id = 1
+
+    def __init__(self, channel, content=None, embed=None):
+        self.id = FakeMessage.next_id
+        FakeMessage.next_id += 1
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        await discord_calls.hit("add_reaction")
+
+    async def edit(self, **kwargs):
+        await discord_calls.hit("edit_message")
+
+
+class FakeChannel:
+
+    def __init__(self, guild, channel_id):
+        self.guild = guild
+        self.id = channel_id
+        self.messages = {}
+
+    def permissions_for(self, member):
+        return SimpleNamespace(send_messages=True)
+
+    async def send(self, content=None, **kwargs):
+        await discord_calls.hit("send_message")
+        message = FakeMessage(self, content, kwargs.get("embed"))
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id):
+        await discord_calls.hit("fetch_message")
+        return self.messages[message_id]
+
+
+class FakeGuild:
+
+    def __init__(self, guild_id, members, participant_role_id=2):
+        self.id = guild_id
+        self._roles = {}
+        self._members = {}
+        self.me = FakeMember(self, 1, bot=True)
+        self.channel = FakeChannel(self, 10)
+        self.text_channels = [self.channel]
+        self.participant = self.add_role(participant_role_id, "Participant")
+        for i in range(members):
+            self._members[1000 + i] = FakeMember(self, 1000 + i)
+
+    def add_role(self, role_id, name):
+        self._roles[role_id] = FakeRole(self, role_id, name)
+        return self._roles[role_id]
+
+    @property
+    def roles(self):
+        return list(self._roles.values())
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+    def get_channel(self, channel_id):
+        return self.channel if channel_id == self.channel.id else None
+
+
+class FakeResponse:
+
+    def __init__(self):
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, *args, **kwargs):
+        await discord_calls.hit("interaction_response")
+        self._done = True
+
+    async def defer(self, *args, **kwargs):
+        await discord_calls.hit("interaction_response")
+        self._done = True
+
+    async def send_modal(self, modal):
+        await discord_calls.hit("interaction_response")
+        self._done = True
+
+
+class FakeFollowup:
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def send(self, content=None, **kwargs):
+        await discord_calls.hit("followup")
+        return FakeMessage(self.channel, content, kwargs.get("embed"))
+
+
+class FakeInteraction:
+
+    def __init__(self, guild, user):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = guild.channel
+        self.channel_id = guild.channel.id
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(guild.channel)
+
+    async def edit_original_response(self, **kwargs):
+        await discord_calls.hit("edit_original_response")
+
+
+def make_events(count, creator_id, base):
+    return [{
+        "id": f"bench{i:06d}",
+        "name": f"Event {i}",
+        "info": "Benchmark event",
+        "reward1": "",
+        "reward2": "",
+        "reward3": "",
+        "participation_reward": "",
+        "start_time": (base + timedelta(days=1, minutes=i)).isoformat(),
+        "started": False,
+        "creator": {
+            "id": creator_id,
+            "name": "bench"
+        },
+        "channel_id": 10
+    } for i in range(count)]
+
+
+class Bench:
+
+    def __init__(self, main, github, size, repeat):
+        self.main = main
+        self.github = github
+        self.size = size
+        self.repeat = repeat
+        self.rows = []
+        self.base = datetime.now(tz=timezone.utc)
+
+        self.state = main.guilds[main.GUILD_ID]
+        self.guild = FakeGuild(main.GUILD_ID, size, main.PARTICIPANT_ROLE_ID)
+        self.staff = next(iter(self.guild._members.values()))
+        main.bot.get_guild = lambda guild_id: self.guild
+        main.bot.get_channel = lambda channel_id: self.guild.channel
+        main.bot._connection.user = self.guild.me
+        main.resolver.refresh(self.guild)
+
+    def seed(self):
+        data = make_events(self.size, self.staff.id, self.base)
+        raw = json.dumps(data, indent=4).encode()
+        config = self.state.config
+        sha = self.github.write(config.events_file, raw)
+        self.state.store.replace_all(self.main.parse_event_times(data), sha)
+        self.main.github.remember_sha(config.events_file, sha)
+        # Each size starts from an empty planner and a cold cache
+        self.github.write(config.planner_file, b"{}")
+        self.state.planner = self.main.PlannerCache(config.planner_file)
+        self.state.calendar = (None, None, None)
+
+    async def measure(self, name, op, setup=None, repeat=None):
+        timings = []
+        github_calls = discord_total = 0
+        runs = repeat or self.repeat
+        for _ in range(runs):
+            if setup is not None:
+                await setup()
+            # Only the measured operation's API calls count, not the setup's
+            github_before = sum(self.github.calls.values())
+            discord_before = sum(discord_calls.values())
+            start = time.perf_counter()
+            await op()
+            timings.append(time.perf_counter() - start)
+            github_calls += sum(self.github.calls.values()) - github_before
+            discord_total += sum(discord_calls.values()) - discord_before
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.rows.append((name, self.size, statistics.median(timings) * 1000,
+                          p95 * 1000, github_calls / runs,
+                          discord_total / runs))
+
+    def interaction(self):
+        return FakeInteraction(self.guild, self.staff)
+
+    async def run(self):
+        main = self.main
+        state = self.state
+        self.seed()
+
+        await self.measure(
+            "/events",
+            lambda: main.events_command.callback(self.interaction()))
+
+        async def give_roles():
+            for member in self.guild.members:
+                member._roles.add(self.guild.participant.id)
+                self.guild.participant.member_ids.add(member.id)
+
+        await self.measure("/end",
+                           lambda: main.end.callback(self.interaction()),
+                           setup=give_roles,
+                           repeat=max(1, min(self.repeat, 3)))
+
+        async def create():
+            await main.createevent.callback(self.interaction(),
+                                            name="Bench",
+                                            info="Created by the benchmark",
+                                            delay="1h")
+            await state.events_commits.flush()
+
+        await self.measure("/createevent", create)
+
+        # A different staff member claims an open week on every run
+        claimers = itertools.cycle(self.guild.members)
+
+        async def empty_planner():
+            self.github.write(state.config.planner_file, b"{}")
+            state.planner.invalidate()
+            await state.planner.get()
+
+        await self.measure(
+            "/claim",
+            lambda: main.claim.callback(
+                FakeInteraction(self.guild, next(claimers)), 2, 1),
+            setup=empty_planner)
+
+        await self.measure("sync (idle)",
+                           lambda: main.sync_events_once(state))
+
+        async def touch_remote():
+            data = make_events(self.size, self.staff.id, self.base)
+            data[0]["name"] = f"Renamed {time.perf_counter()}"
+            self.github.write(state.config.events_file,
+                              json.dumps(data, indent=4).encode())
+
+        await self.measure("sync (changed)",
+                           lambda: main.sync_events_once(state),
+                           setup=touch_remote)
+
+        # Push to reload: webhook delivery until the store has the change
+        web_app = web.Application()
+        web_app.add_routes(main.routes)
+        runner = web.AppRunner(web_app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        hook_url = f"http://127.0.0.1:{port}/github/webhook"
+        sync_task = asyncio.create_task(main.periodic_event_sync(state))
+
+        async def pushed():
+            version = state.store.version
+            assert await send_push(hook_url, WEBHOOK_SECRET,
+                                   [state.config.events_file]) == 202
+            while state.store.version == version:
+                await asyncio.sleep(0.001)
+
+        try:
+            await self.measure("webhook push", pushed, setup=touch_remote)
+        finally:
+            sync_task.cancel()
+            await runner.cleanup()
+
+        # Firing a prepared announcement, as the scheduler does at start time
+        fired = []
+
+        async def prepare():
+            event = make_events(1, self.staff.id, self.base)[0]
+            event["id"] = f"announce{len(fired)}"
+            event["start_time"] = datetime.now(tz=timezone.utc)
+            event = main.parse_event_times([event])[0]
+            main.save_event(state, event)
+            state.prepared[event["id"]] = main.prepare_announcement(
+                state, event)
+            fired.append(event)
+
+        await self.measure("announce",
+                           lambda: main.announce_event(state, fired[-1]),
+                           setup=prepare)
+
+        announcement = await self.guild.channel.send("announcement")
+        main.announcement_messages.add(announcement.id)
+        members = iter(self.guild.members * self.repeat)
+
+        async def react():
+            member = next(members)
+            payload = SimpleNamespace(emoji=SimpleNamespace(name="✅"),
+                                      user_id=member.id,
+                                      member=member,
+                                      message_id=announcement.id,
+                                      channel_id=self.guild.channel.id,
+                                      guild_id=self.guild.id)
+            await main.on_raw_reaction_add(payload)
+
+        await self.measure("reaction add", react)
+        return self.rows
+
+
+async def run_benchmarks(args):
+    github = FakeGitHub()
+    await github.start()
+    os.environ["GITHUB_API_URL"] = github.url
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    os.environ["GITHUB_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+    discord_calls.latency = args.discord_latency / 1000
+
+    # main.py keeps its local store in the working directory
+    workdir = tempfile.TemporaryDirectory(prefix="bot-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir.name)
+    sys.path.insert(0, REPO_DIR)
+    import main
+
+    rows = []
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(
+        open(os.devnull, "w"))
+    try:
+        with quiet:
+            for size in args.sizes:
+                rows += await Bench(main, github, size, args.repeat).run()
+    finally:
+        await main.disk_writer.drain()
+        await main.github.close()
+        await github.stop()
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task():
+                task.cancel()
+        os.chdir(cwd)
+        workdir.cleanup()
+
+    print()
+    print(f"{'handler':<16}{'size':>8}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'github/op':>11}{'discord/op':>12}")
+    for name, size, p50, p95, gh, dc in rows:
+        print(f"{name:<16}{size:>8}{p50:>10.2f}{p95:>10.2f}{gh:>11.1f}{dc:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes",
+                        type=int,
+                        nargs="+",
+                        default=[10, 1000, 10000],
+                        help="event and member counts to run at")
+    parser.add_argument("--repeat",
+                        type=int,
+                        default=20,
+                        help="runs per handler and size")
+    parser.add_argument("--discord-latency",
+                        type=float,
+                        default=0.0,
+                        help="simulated latency per Discord REST call in ms")
+    parser.add_argument("--verbose",
+                        action="store_true",
+                        help="show the bot's own log output")
+    asyncio.run(run_benchmarks(parser.parse_args()))
@@ -2,20 +2,121 @@ import discord
 from discord.ext import commands
 import os
 import re
+import socket
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 import asyncio
-from flask import Flask
-from threading import Thread
+import logging
+import sys
+import threading
+import time
+import traceback
 import base64
-import requests
+import hashlib
+import hmac
+import heapq
+import bisect
+import uuid
+import urllib.parse
+import concurrent.futures
+import aiohttp
+from aiohttp import web
 from discord import SelectOption
 
+# The original server; more can be added in GUILDS_FILE
 GUILD_ID = 457619956687831050
-EVENTS_FILE = "events.json"
+ANNOUNCEMENT_MESSAGES_FILE = "announcement_messages.txt"
+ROLE_JOBS_FILE = "role_jobs.json"
+GUILDS_FILE = os.getenv("GUILDS_FILE", "guilds.json")
 STAFF_ROLE_IDS = {578725917258416129, 879592909203197952}
 NOTIFIER_ROLE_ID = 828406807285202974
 PARTICIPANT_ROLE_ID = 1048722332165873844
+EVENT_ROLE_ID = 1382621918024433697
+
+
+class GuildConfig:
+    """Per-server roles, channels and storage file names.
+
+    The original server keeps the unsuffixed file names so its existing
+    events and planner carry over; other servers get ``-<guild id>``.
+    Files only this host writes get a ``.local`` infix so they never
+    collide with the copies tracked in the repository.
+    """
+
+    def __init__(self,
+                 guild_id,
+                 staff_role_ids,
+                 notifier_role_id,
+                 participant_role_id,
+                 event_role_id,
+                 help_channel_id=None,
+                 updates_channel_id=None):
+        self.guild_id = guild_id
+        self.staff_role_ids = set(staff_role_ids)
+        self.notifier_role_id = notifier_role_id
+        self.participant_role_id = participant_role_id
+        self.event_role_id = event_role_id
+        self.help_channel_id = help_channel_id
+        self.updates_channel_id = updates_channel_id
+
+        suffix = "" if guild_id == GUILD_ID else f"-{guild_id}"
+        self.events_file = f"events{suffix}.json"
+        self.checkpoint_file = f"events{suffix}.local.json"
+        self.journal_file = f"events{suffix}.journal"
+        self.archive_file = f"events_archive{suffix}.jsonl"
+        self.local_archive_file = f"events_archive{suffix}.local.jsonl"
+        self.planner_file = f"eventplanner{suffix}.json"
+
+    def channel_link(self, channel_id):
+        return f"https://discord.com/channels/{self.guild_id}/{channel_id}"
+
+
+def load_guild_configs():
+    """The built-in server plus any listed in GUILDS_FILE (a JSON list)."""
+    configs = {
+        GUILD_ID:
+        GuildConfig(GUILD_ID,
+                    STAFF_ROLE_IDS,
+                    NOTIFIER_ROLE_ID,
+                    PARTICIPANT_ROLE_ID,
+                    EVENT_ROLE_ID,
+                    help_channel_id=666452996967628821,
+                    updates_channel_id=1349087527557922988)
+    }
+    if os.path.exists(GUILDS_FILE):
+        with open(GUILDS_FILE, encoding="utf-8") as f:
+            for entry in json.load(f):
+                config = GuildConfig(
+                    int(entry["guild_id"]),
+                    [int(r) for r in entry.get("staff_role_ids", [])],
+                    entry.get("notifier_role_id"),
+                    entry.get("participant_role_id"),
+                    entry.get("event_role_id"),
+                    help_channel_id=entry.get("help_channel_id"),
+                    updates_channel_id=entry.get("updates_channel_id"))
+                configs[config.guild_id] = config
+    return configs
+
+
+GUILD_CONFIGS = load_guild_configs()
+
+# Sharding: SHARD_COUNT switches to AutoShardedBot and SHARD_IDS picks the
+# shards this process runs; it then only serves those shards' guilds.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",")
+             if i.strip()] or None
+
+
+def owns_guild(guild_id):
+    if SHARD_COUNT is None:
+        return True
+    return SHARD_IDS is None or (guild_id >> 22) % SHARD_COUNT in SHARD_IDS
+
+
+COMMAND_GUILDS = [
+    discord.Object(id=guild_id) for guild_id in GUILD_CONFIGS
+    if owns_guild(guild_id)
+]
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -23,138 +124,1634 @@ intents.reactions = True
 intents.guilds = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+class EventTree(discord.app_commands.CommandTree):
+
+    async def interaction_check(self, interaction):
+        # With replicas, only the leader answers; the others stay silent
+        return leader.is_leader
+
+
+class EventBot(commands.AutoShardedBot if SHARD_COUNT else commands.Bot):
+    sync_tasks = ()
+    web_runner = None
+
+    async def setup_hook(self):
+        self.web_runner = await start_web_server()
+        asyncio.create_task(loop_lag.run())
+        watchdog.watch()
+        if leader.enabled:
+            asyncio.create_task(leader.run())
+
+        # Runs before the gateway connects and must not wait on GitHub:
+        # schedule from the local snapshot, reconcile in the background.
+        for state in guilds.values():
+            compact_events(state)
+            apply_event_diff(state, [], state.store.all())
+
+            # Replicate changes made while GitHub was unreachable
+            if state.store.pending:
+                state.events_commits.request()
+
+        self.sync_tasks = [
+            asyncio.create_task(periodic_event_sync(state))
+            for state in guilds.values()
+        ]
+
+    async def close(self):
+        for state in guilds.values():
+            await state.events_commits.flush()
+            await state.archive_commits.flush()
+            # Leave a journal-free snapshot behind for the next start
+            state.store.checkpoint()
+        await disk_writer.drain()
+        await leader.release()
+        await leader.storage.close()
+        await github.close()
+        if self.web_runner is not None:
+            await self.web_runner.cleanup()
+        await super().close()
+
+
+bot = EventBot(command_prefix="!",
+               intents=intents,
+               tree_cls=EventTree,
+               **({
+                   "shard_count": SHARD_COUNT,
+                   "shard_ids": SHARD_IDS
+               } if SHARD_COUNT else {}))
 
 from discord import app_commands
 
-app = Flask(__name__)
+class _Metric:
+
+    def __init__(self, registry, name, doc, kind):
+        self.name = name
+        self.doc = doc
+        self.kind = kind
+        self._lock = registry.lock
+        registry.metrics.append(self)
+
+    @staticmethod
+    def _labels(labels, extra=None):
+        items = sorted(labels) + (extra or [])
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+    def render(self):
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+
+    def __init__(self, registry, name, doc):
+        super().__init__(registry, name, doc, "counter")
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return super().render() + [
+            f"{self.name}{self._labels(key)} {value}" for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """A gauge whose value is read from ``func`` at scrape time."""
+
+    def __init__(self, registry, name, doc, func):
+        super().__init__(registry, name, doc, "gauge")
+        self.func = func
+
+    def render(self):
+        return super().render() + [f"{self.name} {self.func()}"]
+
+
+class Histogram(_Metric):
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                       10)
+
+    def __init__(self, registry, name, doc, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, doc, "histogram")
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            data = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self):
+        with self._lock:
+            values = [(key, list(data)) for key, data in self._values.items()]
+        lines = super().render()
+        for key, data in values:
+            for bound, count in zip(self.buckets, data):
+                lines.append(
+                    f"{self.name}_bucket{self._labels(key, [('le', bound)])} {count}"
+                )
+            lines.append(
+                f"{self.name}_bucket{self._labels(key, [('le', '+Inf')])} {data[-1]}"
+            )
+            lines.append(f"{self.name}_sum{self._labels(key)} {data[-2]}")
+            lines.append(f"{self.name}_count{self._labels(key)} {data[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry.
+
+    Updates and scrapes go through one lock so metrics can also be
+    recorded from helper threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def counter(self, name, doc):
+        return Counter(self, name, doc)
+
+    def gauge(self, name, doc, func):
+        return Gauge(self, name, doc, func)
+
+    def histogram(self, name, doc, **kwargs):
+        return Histogram(self, name, doc, **kwargs)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+GITHUB_REQUESTS = metrics.counter(
+    "github_api_requests_total",
+    "GitHub contents API requests by storage function and status")
+GITHUB_LATENCY = metrics.histogram(
+    "github_api_request_seconds",
+    "GitHub contents API request latency by storage function")
+SCHEDULED_ANNOUNCEMENTS = metrics.gauge(
+    "scheduled_announcements", "Announcements waiting in the schedulers",
+    lambda: sum(len(state.scheduler) for state in guilds.values()))
+ANNOUNCEMENT_LATENESS = metrics.histogram(
+    "announcement_lateness_seconds",
+    "Time between an event's start_time and its announcement being sent",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300))
+REACTION_LATENCY = metrics.histogram(
+    "reaction_handler_seconds", "Participant reaction handler latency")
+ROLE_OPERATIONS = metrics.counter(
+    "role_operations_total", "Role add/remove calls made by the bot")
+DISCORD_RATE_LIMITS = metrics.counter(
+    "discord_rate_limited_total", "HTTP 429 responses received from Discord")
+
+
+class RateLimitLogCounter(logging.Handler):
+    """Counts the rate-limit warnings discord.py's HTTP client logs."""
+
+    def emit(self, record):
+        if "rate limited" in record.getMessage():
+            DISCORD_RATE_LIMITS.inc()
+
+
+logging.getLogger("discord.http").addHandler(
+    RateLimitLogCounter(level=logging.WARNING))
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a short periodic sleep."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self.beat = None  # time.monotonic() of the last tick
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.beat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+
+
+def blocking_handler(frame):
+    """Name the slash command, or else the outermost main.py function, that
+    a blocked loop-thread frame is running under."""
+    callbacks = {
+        command.callback.__code__: command.qualified_name
+        for guild_id in guilds
+        for command in bot.tree.walk_commands(guild=discord.Object(
+            id=guild_id))
+    }
+    outermost = None
+    while frame is not None:
+        if frame.f_code in callbacks:
+            return f"/{callbacks[frame.f_code]}"
+        if frame.f_code.co_filename == __file__:
+            outermost = frame.f_code.co_name
+        frame = frame.f_back
+    return outermost or "unknown"
+
+
+class LoopWatchdog(threading.Thread):
+    """Samples the event loop thread's stack when the loop stops ticking.
+
+    Runs outside the loop so it can still look when the loop is stuck in
+    blocking code; each stall is logged once with the stack of the frame
+    that blocked it and the command it ran under.
+    """
+
+    def __init__(self, monitor, threshold=1.0):
+        super().__init__(name="loop-watchdog", daemon=True)
+        self.monitor = monitor
+        self.threshold = threshold
+        self.loop_thread_id = None
+
+    def watch(self):
+        self.loop_thread_id = threading.get_ident()
+        self.start()
+
+    def run(self):
+        reported_beat = None
+        while True:
+            time.sleep(self.threshold / 4)
+            beat = self.monitor.beat
+            if beat is None or beat == reported_beat:
+                continue
+            stalled = time.monotonic() - beat - self.monitor.interval
+            if stalled < self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            LOOP_STALLS.inc()
+            print(
+                f"🐢 Event loop blocked for {stalled:.2f}s+ in {blocking_handler(frame)}:\n"
+                + "".join(traceback.format_stack(frame)))
+
+
+loop_lag = LoopLagMonitor()
+watchdog = LoopWatchdog(loop_lag,
+                        threshold=float(os.getenv("LOOP_STALL_THRESHOLD",
+                                                  "1.0")))
+EVENT_LOOP_LAG = metrics.gauge("event_loop_lag_seconds",
+                               "Latest measured event loop lag",
+                               lambda: loop_lag.lag)
+LOOP_STALLS = metrics.counter(
+    "event_loop_stalls_total",
+    "Times the watchdog caught the event loop blocked past its threshold")
+
+# Served from the bot's own event loop; $PORT is set by our host
+WEB_PORT = int(os.environ.get("PORT", 8080))
+routes = web.RouteTableDef()
+
+
+@routes.get('/')
+async def home(request):
+    print("\U0001F501 Ping received from UptimeRobot (or browser)")
+    return web.Response(text="Bot is online!")
+
 
-scheduled_tasks = {}  # Stores asyncio tasks for events
+@routes.get('/metrics')
+async def metrics_endpoint(request):
+    return web.Response(text=metrics.render(), content_type="text/plain")
 
 
-@app.route('/')
-def home():
-    print("\U0001F501 Ping received from UptimeRobot (or browser)")
-    return "Bot is online!"
+@routes.get('/healthz')
+async def healthz(request):
+    # The guild whose events.json was confirmed longest ago
+    syncs = [
+        github.last_success.get(state.config.events_file)
+        for state in guilds.values()
+    ]
+    last_sync = None if None in syncs else min(syncs, default=None)
+    ready = bot.is_ready() and not bot.is_closed()
+    body = {
+        "ready": ready,
+        "gateway_latency_ms":
+        round(bot.latency * 1000, 1) if ready else None,
+        "event_loop_lag_ms": round(loop_lag.lag * 1000, 1),
+        "last_sync": last_sync.isoformat() if last_sync else None,
+        "last_sync_age_s":
+        round((datetime.now(tz=timezone.utc) - last_sync).total_seconds())
+        if last_sync else None,
+        "scheduled_announcements":
+        sum(len(state.scheduler) for state in guilds.values()),
+        "github_rate_remaining": github_budget.remaining,
+        "leader": leader.is_leader
+    }
+    return web.json_response(body, status=200 if ready else 503)
 
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+# Push notifications from GitHub; polling drops to a slow fallback once set
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
 
 
-def keep_alive():
-    t = Thread(target=run)
-    t.daemon = True
-    t.start()
+def webhook_signature(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body,
+                                hashlib.sha256).hexdigest()
 
 
-@bot.event
-async def on_ready():
-    guild = discord.Object(id=GUILD_ID)
+WEBHOOK_CONTENT_TYPES = ("application/json",
+                         "application/x-www-form-urlencoded")
+
+
+def webhook_payload(content_type, body):
+    """Decode a delivery in either of the content types GitHub can send."""
+    if content_type == "application/x-www-form-urlencoded":
+        form = urllib.parse.parse_qs(body.decode())
+        body = form.get("payload", [""])[0]
+    return json.loads(body)
+
+
+@routes.post('/github/webhook')
+async def github_webhook(request):
+    if not GITHUB_WEBHOOK_SECRET:
+        raise web.HTTPNotFound()
+    body = await request.read()
+    signature = request.headers.get("X-Hub-Signature-256", "")
+    if not hmac.compare_digest(
+            signature, webhook_signature(GITHUB_WEBHOOK_SECRET, body)):
+        print("⚠️ Rejected GitHub webhook with a bad signature")
+        raise web.HTTPUnauthorized()
+
+    if request.headers.get("X-GitHub-Event") != "push":
+        return web.Response(status=204)  # ping and anything else
+    if request.content_type not in WEBHOOK_CONTENT_TYPES:
+        print(f"⚠️ Ignored GitHub webhook sent as {request.content_type}, "
+              "set the content type to application/json")
+        raise web.HTTPUnsupportedMediaType()
     try:
-        synced = await bot.tree.sync(guild=guild)
-        print(
-            f"\u2705 Synced {len(synced)} slash command(s) to guild {GUILD_ID}"
-        )
-    except Exception as e:
-        print(f"\u274C Sync failed: {e}")
+        payload = webhook_payload(request.content_type, body)
+    except ValueError as e:
+        print(f"⚠️ Couldn't decode GitHub webhook payload: {e}")
+        raise web.HTTPBadRequest()
+    if payload.get("ref") != f"refs/heads/{GITHUB_BRANCH}":
+        return web.Response(status=204)
+
+    changed = set()
+    for commit in payload.get("commits", []):
+        for key in ("added", "modified", "removed"):
+            changed.update(commit.get(key, []))
+
+    for state in guilds.values():
+        if state.config.events_file in changed:
+            print(f"📬 Push touched {state.config.events_file}, syncing now")
+            state.sync_wakeup.set()
+        if state.config.planner_file in changed:
+            state.planner.invalidate()
+    return web.Response(status=202)
+
+
+async def start_web_server():
+    web_app = web.Application()
+    web_app.add_routes(routes)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", WEB_PORT).start()
+    print(f"🌐 HTTP server listening on port {WEB_PORT}")
+    return runner
 
-    bot.loop.create_task(periodic_event_sync())
 
-    await schedule_upcoming_events()
+@bot.event
+async def on_ready():
+    for g in bot.guilds:
+        resolver.refresh(g)
+
+    for guild_id in guilds:
+        try:
+            synced = await bot.tree.sync(guild=discord.Object(id=guild_id))
+            print(
+                f"\u2705 Synced {len(synced)} slash command(s) to guild {guild_id}"
+            )
+        except Exception as e:
+            print(f"\u274C Sync failed for guild {guild_id}: {e}")
 
 
 def staff_only():
 
     async def predicate(interaction: discord.Interaction) -> bool:
-        if not isinstance(interaction.user, discord.Member):
+        state = guilds.get(interaction.guild_id)
+        if state is None or not isinstance(interaction.user, discord.Member):
             return False
-        return any(role.id in STAFF_ROLE_IDS
+        return any(role.id in state.config.staff_role_ids
                    for role in interaction.user.roles)
 
     return app_commands.check(predicate)
 
 
-def fetch_github_events():
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
-        print("\u274C GITHUB_TOKEN not set!")
-        return []
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_REPO = "CuriousWonder1/Discord-bot"
+GITHUB_BRANCH = "main"
+
+
+class GitHubResponse:
+
+    def __init__(self, status, headers, text):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RateLimitBudget:
+    """Tracks GitHub's request budget from the X-RateLimit-* headers.
+
+    Background polls stop once only ``write_reserve`` requests are left so
+    commits keep working until the window resets; callers then serve reads
+    from their local copies. ``poll_interval()`` spreads the remaining
+    budget over the time left in the window.
+    """
+
+    def __init__(self, write_reserve=100):
+        self.write_reserve = write_reserve
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0  # epoch seconds
+        self.blocked_until = 0.0  # from Retry-After on secondary limits
+        self._throttled = {True: False, False: False}  # poll -> state
+
+    def update(self, status, headers):
+        if "X-RateLimit-Remaining" in headers:
+            self.limit = int(headers.get("X-RateLimit-Limit", 0)) or None
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+            self.reset_at = float(headers.get("X-RateLimit-Reset", 0))
+        if status in (403, 429) and "Retry-After" in headers:
+            self.blocked_until = time.time() + float(headers["Retry-After"])
+
+    def _left(self, now):
+        if self.remaining is None or now >= self.reset_at:
+            return None
+        return self.remaining
+
+    def allow(self, poll):
+        """Whether a request may go out now; polls give way to writes."""
+        now = time.time()
+        left = self._left(now)
+        allowed = now >= self.blocked_until and (
+            left is None or left > (self.write_reserve if poll else 0))
+        kind = "polls" if poll else "requests"
+        if allowed == self._throttled[poll]:
+            self._throttled[poll] = not allowed
+            if allowed:
+                print(f"✅ GitHub rate limit budget recovered, resuming {kind}")
+            else:
+                wait = max(self.blocked_until, self.reset_at) - now
+                print(
+                    f"🐢 GitHub rate limit budget low ({left} left), holding "
+                    f"{kind} for {wait:.0f}s")
+        return allowed
+
+    def poll_interval(self, base, pollers=1):
+        """Seconds until the next background poll, at least ``base``.
+
+        ``pollers`` is the number of loops sharing the budget.
+        """
+        now = time.time()
+        left = self._left(now)
+        if left is None:
+            return max(base, self.blocked_until - now)
+        spare = (left - self.write_reserve) / pollers
+        window = self.reset_at - now
+        if spare <= 0:
+            return max(base, window)
+        return max(base, self.blocked_until - now, window / spare)
+
+
+github_budget = RateLimitBudget()
+GITHUB_RATE_REMAINING = metrics.gauge(
+    "github_rate_limit_remaining",
+    "Requests left in the current GitHub rate-limit window",
+    lambda: github_budget.remaining
+    if github_budget.remaining is not None else float("nan"))
+
+
+class GitHubStorage:
+    """Async client for the GitHub contents API.
+
+    A single pooled aiohttp session is shared by every caller so storage
+    round trips never block the discord.py event loop. Every request is
+    checked against ``github_budget`` first unless ``budgeted`` is False;
+    responses always update it.
+    """
+
+    def __init__(self, repo, branch="main", timeout=10, retries=3,
+                 budgeted=True):
+        self.repo = repo
+        self.branch = branch
+        self.budgeted = budgeted
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self._session = None
+        self._versions = {}  # path -> (etag, sha) from polls and our commits
+        self.last_success = {}  # path -> time of the last successful poll
+
+    def _url(self, path):
+        return f"{GITHUB_API_URL}/repos/{self.repo}/contents/{path}"
+
+    def _blob_url(self, sha):
+        return f"{GITHUB_API_URL}/repos/{self.repo}/git/blobs/{sha}"
+
+    async def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def request(self,
+                      method,
+                      path,
+                      headers=None,
+                      op="request",
+                      url=None,
+                      poll=False,
+                      **kwargs):
+        token = os.getenv("GITHUB_TOKEN")
+        if not token:
+            print("\u274C GITHUB_TOKEN not set!")
+            return None
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github.v3+json",
+            **(headers or {})
+        }
+        if self.budgeted and not github_budget.allow(poll=poll):
+            return None
+        session = await self.session()
+
+        for attempt in range(1, self.retries + 1):
+            started = time.perf_counter()
+            status = "error"
+            try:
+                async with session.request(method,
+                                           url or self._url(path),
+                                           headers=headers,
+                                           **kwargs) as resp:
+                    text = await resp.text()
+                    status = resp.status
+                    github_budget.update(resp.status, resp.headers)
+                    if resp.status < 500 or attempt == self.retries:
+                        return GitHubResponse(resp.status, resp.headers, text)
+                    print(
+                        f"\u26A0\uFE0F GitHub {method} {path} returned {resp.status}, retrying..."
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    print(f"\u274C GitHub {method} {path} failed: {e!r}")
+                    return None
+                print(
+                    f"\u26A0\uFE0F GitHub {method} {path} failed ({e!r}), retrying..."
+                )
+            finally:
+                GITHUB_LATENCY.observe(time.perf_counter() - started,
+                                       function=op,
+                                       file=path)
+                GITHUB_REQUESTS.inc(function=op, file=path, status=status)
+            await asyncio.sleep(0.5 * 2**(attempt - 1))
+
+    async def get_raw(self, path):
+        """Return (raw bytes, sha) for a file, (b"", None) if it doesn't
+        exist, or (None, None) on failure."""
+        resp = await self.request("GET",
+                                  path,
+                                  op="get_file",
+                                  params={"ref": self.branch})
+        if resp is None:
+            return None, None
+        if resp.status == 404:
+            return b"", None
+        if resp.status != 200:
+            print(f"\u274C Failed to fetch {path}: {resp.status}")
+            print("Response:", resp.text)
+            return None, None
+        body = resp.json()
+        return base64.b64decode(body["content"]), body.get("sha")
+
+    async def get_file(self, path, default=None):
+        """Return (decoded JSON, sha) for a file, (default, None) if it doesn't
+        exist, or (None, None) on failure."""
+        raw, sha = await self.get_raw(path)
+        if raw is None:
+            return None, None
+        if sha is None:
+            return default, None
+        return json.loads(raw.decode()), sha
+
+    async def read_if_changed(self, path, poll=False):
+        """Conditional GET; returns (status, decoded JSON or None, sha).
+
+        ``status`` is "changed" (with the data), "unchanged" since the last
+        call, "missing" for a 404 or "failed". Background loops pass
+        ``poll=True`` so the read gives way to writes when the budget is low.
+        """
+        etag, known_sha = self._versions.get(path, (None, None))
+        headers = {"If-None-Match": etag} if etag else None
+        resp = await self.request("GET",
+                                  path,
+                                  headers=headers,
+                                  op="get_file_if_changed",
+                                  poll=poll,
+                                  params={"ref": self.branch})
+        if resp is not None and resp.status in (200, 304):
+            self.last_success[path] = datetime.now(tz=timezone.utc)
+        if resp is None:
+            return "failed", None, known_sha
+        if resp.status == 304:
+            return "unchanged", None, known_sha
+        if resp.status == 404:
+            return "missing", None, None
+        if resp.status != 200:
+            print(f"\u274C Failed to fetch {path}: {resp.status}")
+            print("Response:", resp.text)
+            return "failed", None, known_sha
+
+        body = resp.json()
+        sha = body.get("sha")
+        self._versions[path] = (resp.headers.get("ETag"), sha)
+        if sha is not None and sha == known_sha:
+            return "unchanged", None, sha
+        return "changed", json.loads(
+            base64.b64decode(body["content"]).decode()), sha
+
+    async def get_file_if_changed(self, path, poll=False):
+        """Conditional GET; returns (decoded JSON, sha), or (None, sha) when
+        the file is unchanged since the last call or the request failed."""
+        _, data, sha = await self.read_if_changed(path, poll)
+        return data, sha
+
+    async def get_blob(self, path, sha):
+        """Return the raw bytes of an older revision of ``path``, or None."""
+        resp = await self.request("GET",
+                                  path,
+                                  op="get_blob",
+                                  url=self._blob_url(sha))
+        if resp is None or resp.status != 200:
+            print(f"\u274C Failed to fetch {path}@{sha}:",
+                  resp.status if resp is not None else "no response")
+            return None
+        return base64.b64decode(resp.json()["content"])
+
+    def remember_sha(self, path, sha):
+        if sha is not None:
+            self._versions[path] = (None, sha)
+
+    def known_sha(self, path):
+        return self._versions.get(path, (None, None))[1]
+
+    async def get_sha(self, path):
+        resp = await self.request("GET",
+                                  path,
+                                  op="get_sha",
+                                  params={"ref": self.branch})
+        if resp is None:
+            return None
+        if resp.status != 200:
+            print(
+                f"\u26A0\uFE0F Couldn't retrieve current file SHA: {resp.status}"
+            )
+            print("Response:", resp.text)
+            return None
+        return resp.json().get("sha")
+
+    async def put_file(self, path, raw, message, sha=None):
+        payload = {
+            "message": message,
+            "content": base64.b64encode(raw).decode(),
+            "branch": self.branch
+        }
+        if sha:
+            payload["sha"] = sha
+        resp = await self.request("PUT", path, json=payload, op="put_file")
+        if resp is not None and resp.status in (200, 201):
+            # Our own commit is already reflected in memory, so remember its
+            # blob SHA and let the next poll skip decoding it.
+            new_sha = resp.json().get("content", {}).get("sha")
+            self._versions[path] = (None, new_sha)
+        return resp
+
+
+github = GitHubStorage(GITHUB_REPO, branch=GITHUB_BRANCH)
+
+
+# Leader election between replicas; off unless LEADER_ELECTION=1
+LEADER_ELECTION = os.getenv("LEADER_ELECTION", "") == "1"
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "20"))
+# Required with LEADER_ELECTION: an existing branch other than GITHUB_BRANCH,
+# so renewals stay out of main's history and don't trigger push webhooks
+LEADER_LEASE_BRANCH = os.getenv("LEADER_LEASE_BRANCH")
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaderLease:
+    """Time-limited lease in a shared GitHub file naming the leader replica.
+
+    Only the leader answers commands and reactions and announces events.
+    It renews the lease every ``ttl / 3`` seconds with a write against the
+    SHA of its previous one, so a renewal fails if anyone else wrote in
+    between. A standby reads the lease, sleeps until it runs out and then
+    tries to take it the same way. Validity is measured on the local clock
+    from before the write was sent, minus ``margin`` for clock skew.
+
+    The lease lives on its own branch and bypasses the rate-limit budget:
+    if renewals were held back with everything else, no replica would be
+    left to answer commands.
+    """
+
+    ERROR_DELAY = 1.0
+
+    def __init__(self, storage, path, instance_id, ttl=20.0, margin=2.0,
+                 enabled=True):
+        self.storage = storage
+        self.path = path
+        self.instance_id = instance_id
+        self.ttl = ttl
+        self.margin = margin
+        self.enabled = enabled
+        self._expires = 0.0  # monotonic time our lease runs out
+        self._acquired = asyncio.Event()
+
+    @property
+    def is_leader(self):
+        return not self.enabled or time.monotonic() < self._expires - self.margin
+
+    async def _write(self, sha, holder, expires):
+        started = time.monotonic()
+        body = json.dumps({"holder": holder, "expires": expires}).encode()
+        resp = await self.storage.put_file(self.path, body,
+                                           f"Leader lease: {holder}", sha)
+        if resp is not None and resp.status in (200, 201):
+            self._expires = started + self.ttl if holder else 0.0
+        else:
+            if resp is not None and resp.status not in (409, 422):
+                print(f"❌ Couldn't write the leader lease on branch "
+                      f"{self.storage.branch}: {resp.status}")
+            self._expires = 0.0
+        return self._expires > 0
+
+    async def _step(self):
+        """One renew or acquire attempt; returns seconds until the next."""
+        if self.is_leader:
+            if await self._write(self.storage.known_sha(self.path),
+                                 self.instance_id, time.time() + self.ttl):
+                return self.ttl / 3
+            print("⚠️ Lost the leader lease, standing by")
+            self._acquired.clear()
+            return 1.0
+
+        data, sha = await self.storage.get_file(self.path)
+        now = time.time()
+        if (data and data.get("holder") not in (None, self.instance_id)
+                and data.get("expires", 0) > now):
+            return min(self.ttl, data["expires"] - now) + 0.5
+        if await self._write(sha, self.instance_id, now + self.ttl):
+            print(f"👑 {self.instance_id} is now the leader")
+            self._acquired.set()
+            return self.ttl / 3
+        return 1.0  # another replica won the race, read it again
+
+    async def run(self):
+        while not bot.is_closed():
+            try:
+                delay = await self._step()
+            except Exception as e:
+                # e.g. a malformed lease file; this task must never die
+                print(f"⚠️ Leader lease check failed: {e!r}")
+                self._expires = 0.0
+                delay = self.ERROR_DELAY
+            await asyncio.sleep(delay)
+            if not self.is_leader:
+                self._acquired.clear()
+
+    async def wait_until_leader(self, timeout):
+        if self.is_leader:
+            return True
+        try:
+            await asyncio.wait_for(self._acquired.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.is_leader
 
-    url = "https://api.github.com/repos/CuriousWonder1/Discord-bot/contents/events.json"
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(url, headers=headers)
+    async def release(self):
+        """Hand the lease back on shutdown so a standby takes over at once."""
+        if self.enabled and self.is_leader:
+            await self._write(self.storage.known_sha(self.path), None, 0)
 
-    if response.status_code == 200:
-        content = response.json()["content"]
-        return json.loads(base64.b64decode(content).decode())
-    else:
-        print(f"\u274C Failed to fetch events.json: {response.status_code}")
-        print("Response:", response.text)
-        return []
 
+leader = LeaderLease(
+    GitHubStorage(GITHUB_REPO, branch=LEADER_LEASE_BRANCH, budgeted=False),
+    # Replicas of the same shards share a lease, other shards get their own
+    f"leader-{'-'.join(map(str, SHARD_IDS))}.json" if SHARD_IDS else "leader.json",
+    INSTANCE_ID,
+    ttl=LEADER_LEASE_TTL,
+    enabled=LEADER_ELECTION)
 
-def commit_github_events(data):
-    token = os.getenv("GITHUB_TOKEN")
-    branch = "main"
-    if not token:
-        print("\u274C GITHUB_TOKEN not set!")
-        return
 
-    url = "https://api.github.com/repos/CuriousWonder1/Discord-bot/contents/events.json"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github.v3+json"
+def dump_event(e):
+    return {
+        **e, "start_time":
+        e["start_time"].isoformat()
+        if isinstance(e["start_time"], datetime) else e["start_time"]
     }
 
-    get_resp = requests.get(url, headers=headers)
-    if get_resp.status_code == 200:
-        sha = get_resp.json().get("sha")
-    else:
-        print(
-            f"\u26A0\uFE0F Couldn't retrieve current file SHA: {get_resp.status_code}"
-        )
-        print("Response:", get_resp.text)
-        sha = None
-
-    content = base64.b64encode(
-        json.dumps([{
-            **e, "start_time":
-            e["start_time"].isoformat()
-            if isinstance(e["start_time"], datetime) else e["start_time"]
-        } for e in data],
-                   indent=4).encode()).decode()
-
-    payload = {
-        "message": "Update events",
-        "content": content,
-        "branch": branch
-    }
-    if sha:
-        payload["sha"] = sha
 
-    put_resp = requests.put(url, headers=headers, json=payload)
-    if put_resp.status_code in (200, 201):
-        print("\u2705 events.json updated on GitHub.")
-    else:
-        print("\u274C Failed to update events.json on GitHub:")
-        print("Status:", put_resp.status_code)
-        print("Response:", put_resp.text)
+def serialize_events(data):
+    return json.dumps([dump_event(e) for e in data], indent=4).encode()
 
 
-def load_events():
-    data = fetch_github_events()
+def parse_event_times(data):
     for e in data:
         if isinstance(e["start_time"], str):
             e["start_time"] = datetime.fromisoformat(e["start_time"])
     return data
 
 
-def save_events():
-    commit_github_events(events)
+def is_deleted(event):
+    # Older deletes were recorded by moving start_time back to 2000-01-01
+    return event.get("deleted", False) or event["start_time"].year <= 2000
 
 
-events = load_events()
+def ensure_event_ids(data):
+    """Give events without an id a stable one; returns the events that got one.
+
+    The id is derived from the event itself, so every copy of a legacy
+    event gets the same id without it having to be written back first.
+    """
+    added, seen = [], set()
+    for e in data:
+        if not e.get("id"):
+            start = parse_event_times([{**e}])[0]["start_time"].isoformat()
+            key = f"{e.get('name')}|{start}|{e.get('creator', {}).get('id')}"
+            event_id = uuid.uuid5(uuid.NAMESPACE_URL, key).hex
+            while event_id in seen:  # identical legacy entries
+                event_id = uuid.uuid5(uuid.NAMESPACE_URL, event_id).hex
+            e["id"] = event_id
+            added.append(e)
+        seen.add(e["id"])
+    return added
+
+
+class CommitQueue:
+    """Write-behind queue that coalesces saves of one file into a single PUT.
+
+    ``request()`` only marks the file dirty; a background task commits the
+    latest ``snapshot()`` once the batching window has passed, reusing the
+    blob SHA from our previous commit instead of fetching it. ``snapshot``
+    returns (raw bytes, version) and ``on_commit(version, sha, raw)`` is
+    called after each successful commit.
+
+    When the remote file moved on, or we never saw its SHA, ``resolve()``
+    is awaited to reconcile with it and return a fresh (raw, version) to
+    commit on top of the remote SHA. A SHA is never fetched just to
+    overwrite the remote copy; without ``resolve`` such a flush fails.
+    """
+
+    CONFLICT_RETRIES = 3
+
+    def __init__(self,
+                 path,
+                 message,
+                 snapshot,
+                 on_commit=None,
+                 resolve=None,
+                 delay=2.0,
+                 retry_delay=30.0):
+        self.path = path
+        self.message = message
+        self.snapshot = snapshot
+        self.on_commit = on_commit
+        self.resolve = resolve
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self.pending = False
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def request(self):
+        self.pending = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.pending:
+            await asyncio.sleep(self.delay)
+            if not await self.flush():
+                await asyncio.sleep(self.retry_delay)
+
+    async def compare_and_swap(self, snapshot, message):
+        """Commit ``snapshot()`` on top of the SHA we last saw, never merging.
+
+        Returns the response; a 409/422 means the file moved on.
+        """
+        async with self._lock:
+            raw, version = snapshot()
+            put_resp = await github.put_file(self.path, raw, message,
+                                             github.known_sha(self.path))
+            if (put_resp is not None and put_resp.status in (200, 201)
+                    and self.on_commit is not None):
+                self.on_commit(version, github.known_sha(self.path), raw)
+            return put_resp
+
+    async def flush(self):
+        """Commit any pending change now; returns False if the commit failed."""
+        async with self._lock:
+            if not self.pending:
+                return True
+            self.pending = False
+            try:
+                return await self._commit()
+            except Exception as e:
+                # e.g. a malformed remote copy; keep the change for a retry
+                self.pending = True
+                print(f"\u274C Failed to update {self.path} on GitHub: {e!r}")
+                return False
+
+    async def _commit(self):
+        raw, version = self.snapshot()
+        sha = github.known_sha(self.path)
+        # Nothing read or committed yet: GitHub may hold newer changes
+        reconcile = sha is None
+        put_resp = None
+        for attempt in range(self.CONFLICT_RETRIES):
+            if reconcile:
+                if self.resolve is None:
+                    break
+                resolved = await self.resolve()
+                if resolved is None:
+                    break
+                raw, version = resolved
+                sha = github.known_sha(self.path)
+            put_resp = await github.put_file(self.path, raw, self.message,
+                                             sha)
+            if put_resp is None or put_resp.status not in (409, 422):
+                break
+            # Someone else committed since our last read
+            print(
+                f"\u26A0\uFE0F {self.path} changed on GitHub, reconciling..."
+            )
+            reconcile = True
+
+        if put_resp is not None and put_resp.status in (200, 201):
+            print(f"\u2705 {self.path} updated on GitHub.")
+            if self.on_commit is not None:
+                self.on_commit(version, github.known_sha(self.path), raw)
+            return True
+
+        self.pending = True
+        print(f"\u274C Failed to update {self.path} on GitHub:")
+        if put_resp is not None:
+            print("Status:", put_resp.status)
+            print("Response:", put_resp.text)
+        return False
+
+
+def _write_atomic(path, raw):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _append_fsync(path, raw):
+    with open(path, "ab") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class DiskWriter:
+    """Runs local file writes on one background thread, in submit order.
+
+    Callers on the event loop hand over ready-made bytes and return at
+    once, so an fsync never stalls the loop; ``call()`` awaits a function
+    that has to see every write submitted before it.
+    """
+
+    def __init__(self):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="disk-writer")
+
+    @staticmethod
+    def _run(func, args):
+        try:
+            return func(*args)
+        except OSError as e:
+            print(f"❌ Local write failed: {e!r}")
+            raise
+
+    def submit(self, func, *args):
+        return self._executor.submit(self._run, func, args)
+
+    async def call(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    async def drain(self):
+        await self.call(lambda: None)
+
+
+disk_writer = DiskWriter()
+
+
+class EventStore:
+    """Local durable event store, the primary copy of all events.
+
+    ``checkpoint_path`` holds the last checkpoint in the same format as the
+    GitHub copy at ``path``; every change since is appended to
+    ``journal_path`` as one JSON record per line, fsynced in order by
+    ``disk_writer`` off the event loop. Reads are served from memory.
+
+    Without a checkpoint the store starts from the checked-out ``path``,
+    which it never writes. ``version``/``replicated_version`` track which
+    changes still have to be replicated to GitHub, across restarts too.
+
+    Only live events are kept here; ``compact()`` moves started and deleted
+    events to the append-only ``archive_path`` (JSON lines), which is also
+    kept in memory as the snapshot for its commits.
+
+    Unstarted, undeleted events are also indexed by creator id, sorted by
+    start time, so ``upcoming_by()`` needs no scan of the whole store.
+    """
+
+    CHECKPOINT_EVERY = 200
+
+    def __init__(self, path, checkpoint_path, journal_path, archive_path):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.journal_path = journal_path
+        self.archive_path = archive_path
+        self.version = 0
+        self.replicated_version = 0
+        self.remote_sha = None
+        self._base = None  # (sha, raw) of the last copy known to be on GitHub
+        self._events = {}
+        self._archive = b""
+        self._journal_records = 0
+        self._by_creator = {}  # creator id -> sorted [(start_time, id)]
+        self._index_keys = {}  # event id -> (creator id, (start_time, id))
+
+    @property
+    def pending(self):
+        return self.version > self.replicated_version
+
+    def __len__(self):
+        return len(self._events)
+
+    def all(self):
+        return list(self._events.values())
+
+    def get(self, event_id):
+        return self._events.get(event_id)
+
+    def upcoming_by(self, creator_id, now):
+        """The creator's unstarted events after ``now``, soonest first."""
+        entries = self._by_creator.get(creator_id, [])
+        start = bisect.bisect_right(entries, (now, "\uffff"))
+        return [self._events[event_id] for _, event_id in entries[start:]]
+
+    def _unindex(self, event_id):
+        indexed = self._index_keys.pop(event_id, None)
+        if indexed is None:
+            return
+        creator_id, key = indexed
+        entries = self._by_creator[creator_id]
+        del entries[bisect.bisect_left(entries, key)]
+        if not entries:
+            del self._by_creator[creator_id]
+
+    def _index(self, event):
+        # Events are edited in place, so always drop the old entry first
+        self._unindex(event["id"])
+        if event.get("started") or is_deleted(event):
+            return
+        creator_id = event["creator"]["id"]
+        key = (event["start_time"], event["id"])
+        bisect.insort(self._by_creator.setdefault(creator_id, []), key)
+        self._index_keys[event["id"]] = (creator_id, key)
+
+    def _reindex(self):
+        self._by_creator = {}
+        self._index_keys = {}
+        for event in self._events.values():
+            self._index(event)
+
+    def load(self):
+        data = []
+        source = self.checkpoint_path
+        if not os.path.exists(source):
+            source = self.path  # first start: the copy from the checkout
+        if os.path.exists(source):
+            with open(source, "rb") as f:
+                raw = f.read()
+            data = json.loads(raw)
+        if os.path.exists(self.archive_path):
+            with open(self.archive_path, "rb") as f:
+                self._archive = f.read()
+        legacy = ensure_event_ids(data)
+        self._events = {e["id"]: e for e in parse_event_times(data)}
+        self._reindex()
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn write at the tail, nothing after it
+                    self._apply(record)
+                    self._journal_records += 1
+
+        if source == self.path:
+            # Until GitHub's copy has been read the checkout is the merge
+            # base; starting from it is not a local change to push
+            if self.remote_sha is None and data:
+                self._base = (None, raw)
+            self.checkpoint()
+        elif legacy:
+            self.checkpoint()
+        print(f"📂 Loaded {len(self._events)} events from {source}")
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "put":
+            event = parse_event_times([record["event"]])[0]
+            self._events[event["id"]] = event
+            self._index(event)
+        elif op == "delete":
+            self._events.pop(record["id"], None)
+            self._unindex(record["id"])
+        elif op == "replicated":
+            self.replicated_version = max(self.replicated_version,
+                                          record["upto"])
+            self.remote_sha = record["sha"]
+        elif op == "checkpoint":
+            self.replicated_version = record["upto"]
+            self.remote_sha = record["sha"]
+        self.version = max(self.version, record.get("v", 0))
+
+    def _append(self, record):
+        disk_writer.submit(_append_fsync, self.journal_path,
+                           (json.dumps(record) + "\n").encode())
+        self._journal_records += 1
+        if self._journal_records >= self.CHECKPOINT_EVERY:
+            self.checkpoint()
+
+    def put(self, event):
+        self.version += 1
+        self._events[event["id"]] = event
+        self._index(event)
+        self._append({
+            "op": "put",
+            "v": self.version,
+            "event": dump_event(event)
+        })
+
+    def delete(self, event_id):
+        if self._events.pop(event_id, None) is None:
+            return
+        self._unindex(event_id)
+        self.version += 1
+        self._append({"op": "delete", "v": self.version, "id": event_id})
+
+    def mark_replicated(self, version, sha, raw=None):
+        self.replicated_version = max(self.replicated_version, version)
+        self.remote_sha = sha
+        self._base = (sha, raw) if raw is not None else None
+        self._append({"op": "replicated", "upto": version, "sha": sha})
+
+    def replace_all(self, new_events, sha):
+        """Adopt a remote snapshot as the new local state."""
+        self._events = {e["id"]: e for e in new_events}
+        self._reindex()
+        self.version += 1
+        self.replicated_version = self.version
+        self.remote_sha = sha
+        self._base = (sha, serialize_events(new_events))
+        self.checkpoint()
+
+    def rebase(self, merged_events, sha, remote_raw):
+        """Adopt events merged on top of remote ``sha``; they still need committing."""
+        self._events = {e["id"]: e for e in merged_events}
+        self._reindex()
+        self.version += 1
+        self.remote_sha = sha
+        self._base = (sha, remote_raw)
+        self.checkpoint()
+
+    async def base_raw(self):
+        """Raw copy of events.json at ``remote_sha``, the merge base."""
+        if self._base is None or self._base[0] != self.remote_sha:
+            if self.remote_sha is None:
+                return None
+            raw = await github.get_blob(self.path, self.remote_sha)
+            if raw is None:
+                return None
+            self._base = (self.remote_sha, raw)
+        return self._base[1]
+
+    def compact(self):
+        """Move started and deleted events to the archive; returns them."""
+        archived = [
+            e for e in self._events.values()
+            if e.get("started") or is_deleted(e)
+        ]
+        if not archived:
+            return []
+
+        archived_at = datetime.now(tz=timezone.utc).isoformat()
+        self._append_archive([
+            json.dumps({**dump_event(e), "archived_at": archived_at}).encode()
+            for e in archived
+        ])
+
+        for e in archived:
+            del self._events[e["id"]]
+            self._unindex(e["id"])
+        self.version += 1
+        self.checkpoint()
+        return archived
+
+    def _append_archive(self, lines):
+        raw = b"".join(line + b"\n" for line in lines)
+        self._archive += raw
+        disk_writer.submit(_append_fsync, self.archive_path, raw)
+
+    def read_archive(self):
+        return self._archive
+
+    def merge_archive(self, remote_raw):
+        """Append archived events only ``remote_raw`` has to the local
+        archive, matched by event id; returns how many were added."""
+
+        def key(line):
+            try:
+                return json.loads(line).get("id") or line
+            except json.JSONDecodeError:
+                return line
+
+        seen = {key(line) for line in self.read_archive().splitlines()}
+        missing = []
+        for line in remote_raw.splitlines():
+            if line.strip() and key(line) not in seen:
+                seen.add(key(line))
+                missing.append(line)
+        if missing:
+            self._append_archive(missing)
+        return len(missing)
+
+    def checkpoint(self):
+        record = {
+            "op": "checkpoint",
+            "v": self.version,
+            "upto": self.replicated_version,
+            "sha": self.remote_sha
+        }
+        disk_writer.submit(_write_atomic, self.checkpoint_path,
+                           serialize_events(self.all()))
+        disk_writer.submit(_write_atomic, self.journal_path,
+                           (json.dumps(record) + "\n").encode())
+        self._journal_records = 1
+
+
+async def load_events_if_changed(path, poll=False):
+    """Return (parsed remote events, sha), or None if the file is unchanged."""
+    data, sha = await github.get_file_if_changed(path, poll)
+    if data is None:
+        return None
+    return parse_event_times(data), sha
+
+
+class GuildState:
+    """Everything the bot keeps per server: its event store and commit
+    queues, announcement scheduler, rendered event lists and planner."""
+
+    def __init__(self, config):
+        self.config = config
+        self.guild_id = config.guild_id
+        self.store = EventStore(config.events_file, config.checkpoint_file,
+                                config.journal_file,
+                                config.local_archive_file)
+        self.events_commits = CommitQueue(
+            config.events_file,
+            "Update events",
+            lambda: (serialize_events(self.store.all()), self.store.version),
+            on_commit=self.store.mark_replicated,
+            resolve=lambda: merge_remote_events(self))
+        self.archive_commits = CommitQueue(
+            config.archive_file,
+            "Archive events",
+            lambda: (self.store.read_archive(), None),
+            resolve=lambda: merge_remote_archive(self))
+        self.scheduler = AnnouncementScheduler(
+            lambda event_id: announce_scheduled_event(self, event_id),
+            prepare=lambda event_id: prepare_scheduled_event(self, event_id),
+            lead=timedelta(seconds=ANNOUNCE_PREPARE_LEAD))
+        self.prepared = {}  # event id -> PreparedAnnouncement
+        self.upcoming = UpcomingEventsCache(self)
+        self.planner = PlannerCache(config.planner_file)
+        self.calendar = (None, None, None)  # (planner version, date, calendar)
+        self.sync_wakeup = asyncio.Event()
+
+
+_MISSING = object()
+
+
+def merge_event(base, local, remote):
+    """Field-level three-way merge of an event edited on both sides.
+
+    Returns (merged event, conflicting fields). A field changed differently
+    on both sides keeps our value, except ``started``/``deleted`` which stay
+    set once either side set them.
+    """
+    merged, conflicts = {}, []
+    for key in {**local, **remote}:
+        b = base.get(key, _MISSING)
+        l = local.get(key, _MISSING)
+        r = remote.get(key, _MISSING)
+        if l == r or r == b:
+            value = l
+        elif l == b:
+            value = r
+        elif key in ("started", "deleted"):
+            value = (l is not _MISSING and l) or (r is not _MISSING and r)
+        else:
+            value = l
+            conflicts.append(key)
+        if value is not _MISSING:
+            merged[key] = value
+    return merged, conflicts
+
+
+def merge_events(base, local, remote):
+    """Three-way merge of event lists by id; returns (merged, conflicts).
+
+    An event removed on one side stays removed even if the other side edited
+    it, removal means it was archived or deleted.
+    """
+    base_by_id = {e["id"]: e for e in base}
+    local_by_id = {e["id"]: e for e in local}
+    remote_by_id = {e["id"]: e for e in remote}
+
+    merged, conflicts = [], []
+    order = list(local_by_id) + [i for i in remote_by_id if i not in local_by_id]
+    for event_id in order:
+        b = base_by_id.get(event_id)
+        l = local_by_id.get(event_id)
+        r = remote_by_id.get(event_id)
+        if l == r or r == b:
+            result = l
+        elif l == b:
+            result = r
+        elif l is None or r is None:
+            result = None
+        else:
+            result, fields = merge_event(b or {}, l, r)
+            if fields:
+                conflicts.append((event_id, fields))
+        if result is not None:
+            merged.append(result)
+    return merged, conflicts
+
+
+async def merge_remote_events(state, remote=None):
+    """Merge local changes into a newer events.json on GitHub.
+
+    Called by the commit queue on a SHA conflict or before its first push,
+    and by the sync with the (events, sha) it already fetched as
+    ``remote``. Returns (raw, version) to commit on top of the remote copy,
+    or None if it couldn't be read.
+    """
+    store = state.store
+    if remote is None:
+        data, sha = await github.get_file(store.path, default=[])
+        if data is None:
+            return None
+        github.remember_sha(store.path, sha)
+    else:
+        data, sha = remote
+
+    base_raw = await store.base_raw()
+    if base_raw is None and store.remote_sha is not None:
+        # Without the base, events we archived would look new on GitHub
+        print(f"⚠️ Couldn't read {store.path}@{store.remote_sha}, merging later")
+        return None
+    base = [dump_event(e) for e in parse_event_times(json.loads(base_raw))
+            ] if base_raw else []
+    ensure_event_ids(base)
+    remote = [dump_event(e) for e in parse_event_times(data)]
+    ensure_event_ids(remote)
+    local = json.loads(serialize_events(store.all()))
+
+    merged, conflicts = merge_events(base, local, remote)
+    for event_id, fields in conflicts:
+        print(
+            f"⚠️ Event {event_id} was edited on both sides ({', '.join(fields)}), kept ours"
+        )
+
+    old_events = store.all()
+    merged = parse_event_times(merged)
+    store.rebase(merged, sha, serialize_events(remote))
+    apply_event_diff(state, old_events, merged)
+
+    # Not compact_events(), that would queue a second commit of this file
+    if store.compact():
+        state.archive_commits.request()
+    return serialize_events(store.all()), store.version
+
+
+async def merge_remote_archive(state):
+    """Pull archived events only GitHub has into the local archive.
+
+    The archive's resolve hook, so a push never drops remote history;
+    returns (raw, None) to commit, or None if it couldn't be read.
+    """
+    path = state.config.archive_file
+    raw, sha = await github.get_raw(path)
+    if raw is None:
+        return None
+    github.remember_sha(path, sha)
+    added = state.store.merge_archive(raw)
+    if added:
+        print(f"🗄️ Merged {added} archived event(s) from GitHub")
+    return state.store.read_archive(), None
+
+
+def save_event(state, event):
+    state.store.put(event)
+    state.events_commits.request()
+
+
+def compact_events(state):
+    archived = state.store.compact()
+    if archived:
+        print(f"🗄️ Archived {len(archived)} started/deleted event(s)")
+        state.events_commits.request()
+        state.archive_commits.request()
+
+
+class MessageRegistry:
+    """Persisted set of message IDs the bot posted participation prompts on.
+
+    Lets the reaction handlers accept or reject a reaction with a local
+    lookup. IDs are appended to ``path``, one per line.
+
+    Messages older than the registry (``legacy_before``, a snowflake
+    written as a ``cutover`` line when the file is created, or the oldest
+    registered ID in files without one) were never recorded, so
+    ``is_legacy()`` tells the handlers to check those the old way once.
+    Legacy messages found not to be prompts are appended as ``reject``
+    lines. Nothing is read or written until ``load()``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ids = set()
+        self._rejected = set()  # legacy messages that turned out not to be prompts
+        self.legacy_before = 0
+
+    def load(self):
+        path = self.path
+        cutover = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("cutover "):
+                        cutover = int(line.split()[1])
+                    elif line.startswith("reject "):
+                        self._rejected.add(int(line.split()[1]))
+                    elif line.strip():
+                        self._ids.add(int(line))
+        if cutover is None and not self._ids:
+            cutover = discord.utils.time_snowflake(
+                datetime.now(tz=timezone.utc))
+            disk_writer.submit(_append_fsync, path,
+                               f"cutover {cutover}\n".encode())
+        self.legacy_before = cutover if cutover is not None else min(self._ids)
+
+    def __contains__(self, message_id):
+        return message_id in self._ids
+
+    def is_legacy(self, message_id):
+        return (message_id < self.legacy_before
+                and message_id not in self._rejected)
+
+    def reject(self, message_id):
+        if message_id in self._rejected:
+            return
+        self._rejected.add(message_id)
+        disk_writer.submit(_append_fsync, self.path,
+                           f"reject {message_id}\n".encode())
+
+    def add(self, message_id):
+        if message_id in self._ids:
+            return
+        self._ids.add(message_id)
+        disk_writer.submit(_append_fsync, self.path, f"{message_id}\n".encode())
+
+
+announcement_messages = MessageRegistry(ANNOUNCEMENT_MESSAGES_FILE)
+
+
+async def is_prompt_message(payload):
+    """Whether a reaction is on an announcement or participation prompt."""
+    if payload.message_id in announcement_messages:
+        return True
+    if not announcement_messages.is_legacy(payload.message_id):
+        return False
+
+    # Posted before the registry existed: the bot's own ✅ marks a prompt.
+    # Checked once per message, the answer is remembered either way.
+    channel = bot.get_channel(payload.channel_id)
+    try:
+        message = await channel.fetch_message(payload.message_id)
+    except (AttributeError, discord.HTTPException):
+        return False
+    if any(str(r.emoji) == "✅" and r.me for r in message.reactions):
+        announcement_messages.add(payload.message_id)
+        return True
+    announcement_messages.reject(payload.message_id)
+    return False
+
+
+class GuildResolver:
+    """Caches the IDs of the Participant role and the fallback channel.
+
+    Both are resolved once per guild and refreshed by the role/channel
+    update events, so hot paths only do ID lookups. The role comes from
+    ``participant_role_ids`` (guild id -> role id); only guilds without one
+    configured fall back to a scan for the role by name.
+    """
+
+    def __init__(self,
+                 participant_role_ids=None,
+                 participant_role_name="Participant"):
+        self.participant_role_ids = participant_role_ids or {}
+        self.participant_role_name = participant_role_name
+        self._participant_roles = {}  # guild id -> role id
+        self._fallback_channels = {}  # guild id -> channel id
+
+    def refresh(self, guild):
+        self.refresh_roles(guild)
+        self.refresh_channels(guild)
+
+    def refresh_roles(self, guild):
+        role_id = self.participant_role_ids.get(guild.id)
+        if role_id:
+            role = guild.get_role(role_id)
+        else:
+            role = discord.utils.get(guild.roles,
+                                     name=self.participant_role_name)
+        if role:
+            self._participant_roles[guild.id] = role.id
+        else:
+            self._participant_roles.pop(guild.id, None)
+
+    def refresh_channels(self, guild):
+        channel = next((ch for ch in guild.text_channels
+                        if ch.permissions_for(guild.me).send_messages), None)
+        if channel:
+            self._fallback_channels[guild.id] = channel.id
+        else:
+            self._fallback_channels.pop(guild.id, None)
+
+    def participant_role(self, guild):
+        role_id = self._participant_roles.get(guild.id)
+        return guild.get_role(role_id) if role_id else None
+
+    def fallback_channel(self, guild):
+        channel_id = self._fallback_channels.get(guild.id)
+        return guild.get_channel(channel_id) if channel_id else None
+
+
+resolver = GuildResolver({
+    guild_id: config.participant_role_id
+    for guild_id, config in GUILD_CONFIGS.items()
+    if config.participant_role_id
+})
 
 
 def parse_time_delay(time_str: str) -> int:
@@ -168,57 +1765,48 @@ def parse_time_delay(time_str: str) -> int:
     return value * {"s": 1, "m": 60, "h": 3600, "d": 86400}[unit]
 
 
-async def announce_event(event):
-    now = datetime.now(tz=timezone.utc)
-    delay = (event["start_time"] - now).total_seconds()
-    try:
-        if delay > 0:
-            await asyncio.sleep(delay)
-    except asyncio.CancelledError:
-        print(f"🛑 Announcement task for '{event['name']}' was cancelled.")
-        return  # Stop further execution if cancelled
+# Seconds before start_time that an announcement is resolved and rendered
+ANNOUNCE_PREPARE_LEAD = 60
 
-    guild = bot.get_guild(GUILD_ID)
-    if guild is None:
-        print(f"Failed to get guild {GUILD_ID} for event {event['name']}")
-        return
 
-    # Use provided channel if available, otherwise default to first available
-    channel = guild.get_channel(event.get("channel_id"))
-    if channel is None:
-        print(
-            f"Fallback: no stored channel for event {event['name']}, using first available."
-        )
-        channel = next((ch for ch in guild.text_channels
-                        if ch.permissions_for(guild.me).send_messages), None)
+class PreparedAnnouncement:
+    """An announcement resolved and rendered ahead of its start time."""
+
+    def __init__(self, key, channel, content, embed):
+        self.key = key  # announcement_key() of the event it was built from
+        self.channel = channel
+        self.content = content
+        self.embed = embed
 
-    if channel is None:
-        print(f"No suitable channel found for event {event['name']}")
-        return
 
-    role_mention = "<@&1382621918024433697>"
-    await channel.send(role_mention,
-                       allowed_mentions=discord.AllowedMentions(roles=True))
+def announcement_key(event):
+    return (event["name"], event["info"], event.get("reward1"),
+            event.get("reward2"), event.get("reward3"),
+            event.get("participation_reward"), event.get("channel_id"),
+            event["creator"]["name"])
 
-    embed = discord.Embed(title=event["name"].upper(),
-                          description=event["info"],
+
+def render_announcement(event):
+    # Clip to Discord's embed limits so a long field can't fail the send
+    embed = discord.Embed(title=event["name"].upper()[:256],
+                          description=event["info"][:4096],
                           color=discord.Color.blue())
 
     if event.get("reward1"):
         embed.add_field(name="\U0001F381 1st Place Reward",
-                        value=event["reward1"],
+                        value=event["reward1"][:1024],
                         inline=False)
     if event.get("reward2"):
         embed.add_field(name="\U0001F381 2nd Place Reward",
-                        value=event["reward2"],
+                        value=event["reward2"][:1024],
                         inline=False)
     if event.get("reward3"):
         embed.add_field(name="\U0001F381 3rd Place Reward",
-                        value=event["reward3"],
+                        value=event["reward3"][:1024],
                         inline=False)
     if event.get("participation_reward"):
         embed.add_field(name="\U0001F381 Participation Reward",
-                        value=event["participation_reward"],
+                        value=event["participation_reward"][:1024],
                         inline=False)
 
     embed.add_field(
@@ -227,64 +1815,674 @@ async def announce_event(event):
         "To participate in this event, tick the reaction below and you will be given the Participant role.",
         inline=False)
 
-    embed.set_footer(text=f"Created by {event['creator']['name']}")
+    embed.set_footer(text=f"Created by {event['creator']['name']}"[:2048])
+
+    overflow = len(embed) - 6000
+    if overflow > 0:
+        embed.description = embed.description[:-overflow]
+    return embed
+
+
+def prepare_announcement(state, event):
+    """Resolve the channel and render the message; None if it can't be posted."""
+    guild = bot.get_guild(state.guild_id)
+    if guild is None:
+        print(f"Failed to get guild {state.guild_id} for event {event['name']}")
+        return None
+
+    # Use provided channel if available, otherwise default to first available
+    channel = guild.get_channel(event.get("channel_id"))
+    if channel is None:
+        print(
+            f"Fallback: no stored channel for event {event['name']}, using first available."
+        )
+        channel = resolver.fallback_channel(guild)
+
+    if channel is None:
+        print(f"No suitable channel found for event {event['name']}")
+        return None
+
+    role_id = state.config.event_role_id
+    return PreparedAnnouncement(announcement_key(event), channel,
+                                f"<@&{role_id}>" if role_id else None,
+                                render_announcement(event))
+
+
+def prepare_scheduled_event(state, event_id):
+    """Scheduler hook, runs ANNOUNCE_PREPARE_LEAD seconds before start."""
+    # Drop anything prepared for events that were cancelled since
+    for stale in [i for i in state.prepared if i not in state.scheduler]:
+        del state.prepared[stale]
+
+    event = state.store.get(event_id)
+    if event is None or not bot.is_ready():
+        return  # prepared at start time instead
+    prepared = prepare_announcement(state, event)
+    if prepared is not None:
+        state.prepared[event_id] = prepared
 
-    message = await channel.send(embed=embed)
-    await message.add_reaction("\u2705")
 
+async def announce_event(state, event):
+    prepared = state.prepared.pop(event["id"], None)
+    if prepared is None or prepared.key != announcement_key(event):
+        prepared = prepare_announcement(state, event)
+    if prepared is None:
+        return
+
+    # Mention and embed go out as one message
+    message = await prepared.channel.send(
+        prepared.content,
+        embed=prepared.embed,
+        allowed_mentions=discord.AllowedMentions(roles=True))
+    lateness = (datetime.now(tz=timezone.utc) -
+                event["start_time"]).total_seconds()
+    ANNOUNCEMENT_LATENESS.observe(lateness)
+    reaction = asyncio.create_task(message.add_reaction("✅"))
+
+    # Persist while the reaction is in flight; GitHub gets it write-behind
+    announcement_messages.add(message.id)
     event["started"] = True
-    save_events()
-    print(f"Event announced: {event['name']}")
+    event["announcement_lateness"] = round(lateness, 3)
+    save_event(state, event)
+    print(f"Event announced: {event['name']} ({lateness * 1000:.0f} ms late)")
+    try:
+        await reaction
+    except Exception as e:
+        print(f"⚠️ Failed to add reaction to announcement of {event['name']}: {e}")
+    compact_events(state)
 
 
-async def schedule_upcoming_events():
-    global scheduled_tasks
-    global events
-    now = datetime.now(tz=timezone.utc)
+class AnnouncementScheduler:
+    """Schedules announcements from a min-heap of (start_time, event_id).
+
+    A single timer task sleeps until the earliest deadline. Rescheduling or
+    cancelling only updates ``_deadlines``; stale heap entries are skipped
+    when they reach the top.
 
-    for idx, event in enumerate(events):
-        if isinstance(event["start_time"], str):
-            event["start_time"] = datetime.fromisoformat(event["start_time"])
+    If given, ``prepare(event_id)`` is called ``lead`` seconds before each
+    deadline from a second heap, so the work at start time is just the send.
+    """
 
-        if not event.get("started", False) and event["start_time"] > now:
-            # Cancel any previously scheduled task for this index
-            existing_task = scheduled_tasks.get(idx)
-            if existing_task and not existing_task.done():
-                existing_task.cancel()
-                print(f"❌ Cancelled previous task for event {event['name']}")
+    def __init__(self, callback, prepare=None, lead=timedelta(0)):
+        self._callback = callback
+        self._prepare = prepare
+        self._lead = lead
+        self._heap = []
+        self._prepare_heap = []  # (start_time - lead, start_time, event_id)
+        self._deadlines = {}  # event_id -> start_time currently scheduled
+        self._wakeup = asyncio.Event()
+        self._timer = None
 
-            # Schedule new task
-            task = asyncio.create_task(announce_event(event))
-            scheduled_tasks[idx] = task
-            print(f"✅ Scheduled announcement for {event['name']}")
+    def __len__(self):
+        return len(self._deadlines)
 
+    def __contains__(self, event_id):
+        return event_id in self._deadlines
 
-async def periodic_event_sync():
+    def schedule(self, event_id, start_time):
+        """Schedule or move an announcement; returns False if unchanged."""
+        if self._deadlines.get(event_id) == start_time:
+            return False
+        self._deadlines[event_id] = start_time
+        heapq.heappush(self._heap, (start_time, event_id))
+        if self._prepare is not None:
+            heapq.heappush(self._prepare_heap,
+                           (start_time - self._lead, start_time, event_id))
+        if (self._heap[0][1] == event_id or self._prepare_heap
+                and self._prepare_heap[0][2] == event_id):
+            self._wakeup.set()
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._run())
+        return True
+
+    def cancel(self, event_id):
+        if self._deadlines.pop(event_id, None) is None:
+            return False
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(t, i) for i, t in self._deadlines.items()]
+            heapq.heapify(self._heap)
+            self._prepare_heap = [
+                entry for entry in self._prepare_heap
+                if self._is_live(entry[1:])
+            ]
+            heapq.heapify(self._prepare_heap)
+        return True
+
+    def _is_live(self, entry):
+        start_time, event_id = entry
+        return self._deadlines.get(event_id) == start_time
+
+    def _next_prepare(self):
+        while self._prepare_heap and not self._is_live(
+                self._prepare_heap[0][1:]):
+            heapq.heappop(self._prepare_heap)
+        return self._prepare_heap[0] if self._prepare_heap else None
+
+    async def _run(self):
+        while True:
+            while self._heap and not self._is_live(self._heap[0]):
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            now = datetime.now(tz=timezone.utc)
+            pending = self._next_prepare()
+            if pending is not None and pending[0] <= now:
+                heapq.heappop(self._prepare_heap)
+                try:
+                    self._prepare(pending[2])
+                except Exception as e:
+                    print(f"⚠️ Failed to prepare announcement {pending[2]}: {e}")
+                continue
+
+            start_time, event_id = self._heap[0]
+            wake_at = min(start_time, pending[0]) if pending else start_time
+            delay = (wake_at - now).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            del self._deadlines[event_id]
+            asyncio.create_task(self._callback(event_id))
+
+
+async def announce_scheduled_event(state, event_id):
+    # Scheduling starts before the gateway connects
     await bot.wait_until_ready()
+    if leader.enabled:
+        # A standby only steps in if the leader dies around start time
+        if not await leader.wait_until_leader(ANNOUNCE_TAKEOVER_GRACE):
+            return
+        event = await claim_announcement(state, event_id)
+        if event is None:
+            return
+    else:
+        event = state.store.get(event_id)
+        if event is None or event.get("started"):
+            return
+    try:
+        await announce_event(state, event)
+    except Exception as e:
+        print(f"❌ Failed to announce event {event['name']}: {e}")
+
+
+def is_schedulable(event, now):
+    return (not event.get("started", False) and not is_deleted(event)
+            and event["start_time"] > now)
+
+
+def diff_events(old, new):
+    """Compare two event snapshots by id.
+
+    Returns (added, removed, retimed, changed): retimed events had their
+    start time, started or deleted flag changed, changed events only their
+    content.
+    """
+    old_by_id = {e["id"]: e for e in old}
+    new_by_id = {e["id"]: e for e in new}
+
+    added = [new_by_id[i] for i in new_by_id.keys() - old_by_id.keys()]
+    removed = [old_by_id[i] for i in old_by_id.keys() - new_by_id.keys()]
+    retimed, changed = [], []
+    for i in new_by_id.keys() & old_by_id.keys():
+        before, after = old_by_id[i], new_by_id[i]
+        if (before["start_time"] != after["start_time"]
+                or before.get("started") != after.get("started")
+                or before.get("deleted") != after.get("deleted")):
+            retimed.append(after)
+        elif before != after:
+            changed.append(after)
+    return added, removed, retimed, changed
+
+
+def apply_event_diff(state, old, new):
+    """Only touch the timers of events that were added, removed or retimed."""
+    added, removed, retimed, changed = diff_events(old, new)
+    now = datetime.now(tz=timezone.utc)
+    scheduler = state.scheduler
+
+    for event in added + retimed:
+        if is_schedulable(event, now):
+            if scheduler.schedule(event["id"], event["start_time"]):
+                print(f"✅ Scheduled announcement for {event['name']}")
+        elif scheduler.cancel(event["id"]):
+            print(f"❌ Cancelled announcement for event {event['name']}")
+
+    for event in removed:
+        if scheduler.cancel(event["id"]):
+            print(f"❌ Cancelled announcement for event {event['name']}")
+
+    if added or removed or retimed or changed:
+        print(
+            f"🔄 Events synced: {len(added)} added, {len(removed)} removed, "
+            f"{len(retimed)} retimed, {len(changed)} updated")
+
+
+async def sync_events_once(state, poll=False):
+    """One reconcile pass with GitHub; returns False if a push failed.
+
+    The periodic sync passes ``poll=True``; its read is the first to be
+    held back when the rate-limit budget runs low.
+    """
+    store = state.store
+    # Push local changes first so a remote reload cannot drop them
+    if (state.events_commits.pending
+            and not await state.events_commits.flush()):
+        return False
+
+    version, remote_sha = store.version, store.remote_sha
+    remote = await load_events_if_changed(store.path, poll)
+
+    # Nothing to decode or reschedule when events.json is untouched
+    if remote is not None:
+        print(f"🔄 {store.path} changed on GitHub, rescheduling...")
+        new_events, sha = remote
+        if store.remote_sha != remote_sha:
+            return True  # our own commit landed meanwhile, the read may predate it
+        if store.pending or store.version != version:
+            # A local write landed during the read; merge instead of dropping it
+            if await merge_remote_events(state, remote) is None:
+                # Read it again next time instead of committing over it
+                github.remember_sha(store.path, store.remote_sha)
+            state.events_commits.request()
+            return True
+        # Legacy ids are derived from the event, nothing to write back
+        ensure_event_ids(new_events)
+
+        # Adopt the remote copy as the new local state
+        old_events = store.all()
+        store.replace_all(new_events, sha)
+
+        # Reschedule only the announcements that actually changed
+        apply_event_diff(state, old_events, new_events)
+        compact_events(state)
+    return True
+
+
+EVENT_SYNC_INTERVAL = 30
+# With webhooks, polling only catches pushes that never reached us
+EVENT_SYNC_FALLBACK_INTERVAL = int(os.getenv("EVENT_SYNC_FALLBACK_INTERVAL",
+                                             "600"))
+
+
+async def periodic_event_sync(state):
+    base = (EVENT_SYNC_FALLBACK_INTERVAL
+            if GITHUB_WEBHOOK_SECRET else EVENT_SYNC_INTERVAL)
     while not bot.is_closed():
-        print("🔄 Checking GitHub for event updates...")
-        new_events = load_events()
+        state.sync_wakeup.clear()
+        await sync_events_once(state, poll=True)
+        # Polls slow down as the GitHub rate-limit budget runs low
+        try:
+            await asyncio.wait_for(
+                state.sync_wakeup.wait(),
+                github_budget.poll_interval(base, pollers=len(guilds)))
+        except asyncio.TimeoutError:
+            pass
+
+
+ANNOUNCE_TAKEOVER_GRACE = 3 * LEADER_LEASE_TTL
+CLAIM_RETRY_DELAY = 0.5
+
+
+async def claim_announcement(state, event_id):
+    """Mark an event as started on GitHub before announcing it.
+
+    The write is a compare-and-swap on the SHA with no merge, so when two
+    replicas race only one succeeds; the other reloads and sees the event
+    already started. Conflicts with unrelated commits and failed requests
+    are retried for as long as the event is unclaimed, we lead and
+    ANNOUNCE_TAKEOVER_GRACE hasn't passed. Returns the claimed event, or None.
+    """
+    store = state.store
+    deadline = time.monotonic() + ANNOUNCE_TAKEOVER_GRACE
+    attempts = 0
+    while True:
+        attempts += 1
+        if await sync_events_once(state):
+            event = store.get(event_id)
+            if event is None or event.get("started") or is_deleted(event):
+                return None
+
+            claimed = {**event, "started": True, "announced_by": INSTANCE_ID}
+            version = store.version
+
+            def snapshot():
+                events = [
+                    claimed if e["id"] == event_id else e for e in store.all()
+                ]
+                return serialize_events(events), version
+
+            resp = await state.events_commits.compare_and_swap(
+                snapshot, f"Claim announcement of {event['name']}")
+            if resp is not None and resp.status in (200, 201):
+                store.put(claimed)
+                return claimed
+            if resp is not None and resp.status not in (409, 422):
+                print(f"❌ Couldn't claim event {event['name']} "
+                      f"({resp.status}), not announcing it")
+                return None
+
+        if time.monotonic() >= deadline or not leader.is_leader:
+            event = store.get(event_id)
+            name = event["name"] if event else event_id
+            print(f"❌ Gave up claiming event {name} after {attempts} "
+                  "attempts, not announcing it")
+            return None
+        await asyncio.sleep(min(CLAIM_RETRY_DELAY * attempts, 5.0))
+
+
+class BulkRoleOperation:
+    """Adds or removes one role for many members with a bounded worker pool.
+
+    Requests still go through discord.py's per-route rate-limit buckets;
+    the pool only keeps a few of them in flight, and a worker that still
+    gets a 429 backs off and retries. Members that are still
+    outstanding are saved under ``key`` in ROLE_JOBS_FILE, so a run that
+    fails or is interrupted is resumed by the next run with the same key.
+    """
+
+    WORKERS = 4
+    SAVE_EVERY = 25
+
+    def __init__(self, key, guild, role, action, reason=None):
+        self.key = key
+        self.guild = guild
+        self.role = role
+        self.action = action  # "add" or "remove"
+        self.reason = reason
+        self.done = 0
+        self.skipped = 0
+        self.failed = []
+        self._remaining = set()
+
+    @staticmethod
+    def _load_jobs():
+        if not os.path.exists(ROLE_JOBS_FILE):
+            return {}
+        with open(ROLE_JOBS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def _store_job(cls, key, job):
+        jobs = cls._load_jobs()
+        if job:
+            jobs[key] = job
+        else:
+            jobs.pop(key, None)
+        _write_atomic(ROLE_JOBS_FILE, json.dumps(jobs).encode())
+
+    def _save(self):
+        job = {
+            "action": self.action,
+            "role_id": self.role.id,
+            "remaining": sorted(self._remaining)
+        } if self._remaining else None
+        disk_writer.submit(self._store_job, self.key, job)
+
+    async def resumed_ids(self):
+        job = (await disk_writer.call(self._load_jobs)).get(self.key)
+        if job and job["action"] == self.action and job["role_id"] == self.role.id:
+            return job["remaining"]
+        return []
+
+    def _needs_change(self, member):
+        has_role = member.get_role(self.role.id) is not None
+        return has_role if self.action == "remove" else not has_role
+
+    async def _apply(self, member):
+        if self.action == "add":
+            await member.add_roles(self.role, reason=self.reason)
+        else:
+            await member.remove_roles(self.role, reason=self.reason)
+
+    async def _worker(self, queue):
+        while True:
+            try:
+                member_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            member = self.guild.get_member(member_id)
+            ok = True
+            if member is None or not self._needs_change(member):
+                self.skipped += 1
+            else:
+                ok = await self._apply_with_retry(member)
 
-        # Convert start_time strings to datetime
-        for e in new_events:
-            if isinstance(e["start_time"], str):
-                e["start_time"] = datetime.fromisoformat(e["start_time"])
+            if ok:
+                self._remaining.discard(member_id)
+            else:
+                self.failed.append(member_id)
+            if (self.done + self.skipped) % self.SAVE_EVERY == 0:
+                self._save()
 
-        # Overwrite in-memory event list
-        global events
-        events = new_events
+    async def _apply_with_retry(self, member, attempts=3):
+        for attempt in range(attempts):
+            try:
+                await self._apply(member)
+                self.done += 1
+                ROLE_OPERATIONS.inc(action=self.action, result="ok")
+                return True
+            except discord.HTTPException as e:
+                if e.status == 429 and attempt < attempts - 1:
+                    await asyncio.sleep(2**attempt)
+                    continue
+                print(
+                    f"Failed to {self.action} {self.role.name} for {member.display_name}: {e}"
+                )
+                ROLE_OPERATIONS.inc(action=self.action, result="failed")
+                return False
+
+    def progress_text(self, total):
+        verb = "Assigned" if self.action == "add" else "Removed"
+        processed = self.done + self.skipped + len(self.failed)
+        text = f"⏳ {verb} {self.role.name}: {processed}/{total}"
+        if self.failed:
+            text += f" ({len(self.failed)} failed)"
+        return text
+
+    async def run(self, member_ids, progress=None, progress_interval=3.0):
+        """Process ``member_ids`` plus anything left over from a previous run.
+
+        ``progress`` is an optional coroutine function called with a status
+        line at most every ``progress_interval`` seconds. If it fails (say
+        the interaction token expired) progress reporting stops and the run
+        carries on.
+        """
+        ids = list(dict.fromkeys([*await self.resumed_ids(), *member_ids]))
+        self._remaining = set(ids)
+        self._save()
+
+        queue = asyncio.Queue()
+        for member_id in ids:
+            queue.put_nowait(member_id)
+        workers = [
+            asyncio.create_task(self._worker(queue))
+            for _ in range(min(self.WORKERS, len(ids)))
+        ]
+
+        try:
+            while workers:
+                finished, pending = await asyncio.wait(
+                    workers, timeout=progress_interval)
+                for task in finished:
+                    task.result()
+                workers = list(pending)
+                if workers and progress is not None:
+                    try:
+                        await progress(self.progress_text(len(ids)))
+                    except Exception as e:
+                        print(f"⚠️ Couldn't report {self.role.name} progress, "
+                              f"carrying on without it: {e!r}")
+                        progress = None
+        finally:
+            # Never leave workers running behind a failed or cancelled run
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._save()
+        return self
+
+
+EVENTS_PER_PAGE = 10
+
+
+class UpcomingEventsCache:
+    """Upcoming events and their rendered embed pages, cached per store
+    version.
+
+    The cache is also dropped once the soonest upcoming event has started,
+    since that changes the list without a store write.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self._version = None
+        self._expires = None
+        self._upcoming = []
+        self._pages = {}  # render function -> list of embeds
+
+    def _refresh(self):
+        store = self.state.store
+        now = datetime.now(tz=timezone.utc)
+        if self._version == store.version and (self._expires is None
+                                               or now < self._expires):
+            return
+        self._upcoming = sorted(
+            (e for e in store.all() if is_schedulable(e, now)),
+            key=lambda e: e["start_time"])
+        self._expires = self._upcoming[0]["start_time"] if self._upcoming else None
+        self._version = store.version
+        self._pages = {}
+
+    def upcoming(self):
+        self._refresh()
+        return self._upcoming
+
+    def pages(self, render):
+        self._refresh()
+        if render not in self._pages:
+            self._pages[render] = render(self._upcoming, self.state.config)
+        return self._pages[render]
+
+
+def paginate(items, per_page=EVENTS_PER_PAGE):
+    return [items[i:i + per_page] for i in range(0, len(items), per_page)]
+
+
+def render_events_pages(upcoming, config):
+    chunks = paginate(upcoming)
+    pages = []
+    for number, chunk in enumerate(chunks, 1):
+        embed = discord.Embed(title="📅 Upcoming Events",
+                              color=discord.Color.green())
+        for e in chunk:
+            embed.add_field(
+                name=e["name"],
+                value=
+                f"Starts <t:{int(e['start_time'].timestamp())}:F>\nCreated by: <@{e['creator']['id']}>",
+                inline=False)
+        if len(chunks) > 1:
+            embed.set_footer(text=f"Page {number}/{len(chunks)}")
+        pages.append(embed)
+    return pages
 
-        # Reschedule announcements
-        await schedule_upcoming_events()
 
-        await asyncio.sleep(30)
+def render_end_pages(upcoming, config):
+    description_text = (
+        "This channel is temporarily closed until an event is being held. It will reopen once the event starts.\n"
+    )
+    if config.help_channel_id:
+        description_text += f"If you have any questions about upcoming events, feel free to ping the host, DM them, or ask in ⁠{config.channel_link(config.help_channel_id)}\n\n"
+    else:
+        description_text += "If you have any questions about upcoming events, feel free to ping the host or DM them.\n\n"
+
+    if upcoming:
+        description_text += "🗓️ **Current Upcoming Events:**"
+    else:
+        description_text += "🚫 **There are currently no upcoming events scheduled via the bot.**"
+
+    chunks = paginate(upcoming) or [[]]
+    pages = []
+    for number, chunk in enumerate(chunks, 1):
+        embed = discord.Embed(title="🎉 Event Information",
+                              description=description_text,
+                              color=discord.Color.orange())
+
+        for e in chunk:
+            embed.add_field(
+                name=e["name"],
+                value=
+                f"Starts <t:{int(e['start_time'].timestamp())}:F>\nCreated by: <@{e['creator']['id']}>\n",
+                inline=False)
+
+        if config.updates_channel_id:
+            embed.add_field(
+                name="",
+                value=
+                f"Keep an eye out for future events in here or ⁠{config.channel_link(config.updates_channel_id)}! 👀",
+                inline=False)
+        else:
+            embed.add_field(name="",
+                            value="Keep an eye out for future events in here! 👀",
+                            inline=False)
+        if len(chunks) > 1:
+            embed.set_footer(text=f"Page {number}/{len(chunks)}")
+        pages.append(embed)
+    return pages
+
+
+class EmbedPager(discord.ui.View):
+    """Previous/next buttons over a list of pre-rendered embeds."""
+
+    def __init__(self, pages, timeout=600):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.index = 0
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous.disabled = self.index == 0
+        self.next.disabled = self.index == len(self.pages) - 1
+
+    async def _show(self, interaction):
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.index],
+                                                view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction,
+                       button: discord.ui.Button):
+        self.index = max(0, self.index - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction,
+                   button: discord.ui.Button):
+        self.index = min(len(self.pages) - 1, self.index + 1)
+        await self._show(interaction)
+
+
+def paged_message(pages):
+    """Keyword arguments to send the first page, with buttons if needed."""
+    kwargs = {"embed": pages[0]}
+    if len(pages) > 1:
+        kwargs["view"] = EmbedPager(pages)
+    return kwargs
 
 
 @bot.tree.command(
     name="rolemessage",
     description=
     "Give the Participant role to users who ticked the first reaction",
-    guild=discord.Object(id=GUILD_ID))
+    guilds=COMMAND_GUILDS)
 @staff_only()
 @app_commands.describe(
     message_id="The ID of the message to scan for reactions")
@@ -299,7 +2497,7 @@ async def rolemessage(interaction: discord.Interaction, message_id: str):
                                         ephemeral=True)
         return
 
-    role = discord.utils.get(interaction.guild.roles, name="Participant")
+    role = resolver.participant_role(interaction.guild)
     if not role:
         await interaction.followup.send("❌ 'Participant' role not found.",
                                         ephemeral=True)
@@ -311,220 +2509,203 @@ async def rolemessage(interaction: discord.Interaction, message_id: str):
         return
 
     first_reaction = message.reactions[0]
-    assigned_users = set()
-
-    async for user in first_reaction.users():
-        if user.bot:
-            continue
-        member = interaction.guild.get_member(user.id)
-        if member and role not in member.roles:
-            await member.add_roles(role)
-            assigned_users.add(user.id)
-
-    await interaction.followup.send(
-        f"✅ Assigned 'Participant' role to {len(assigned_users)} users who reacted to the message's first reaction.",
-        ephemeral=True)
-
-
-@bot.tree.command(name="editevent",
-                  description="Edit one of your scheduled events",
-                  guild=discord.Object(id=GUILD_ID))
-@staff_only()
-async def editevent(interaction: discord.Interaction):
-    await interaction.response.defer(ephemeral=True)
-
-    now = datetime.now(tz=timezone.utc)
-    user_id = interaction.user.id
-    current_events = load_events()
+    member_ids = [
+        user.id async for user in first_reaction.users() if not user.bot
+    ]
 
-    def parse_start(event):
-        if isinstance(event.get("start_time"), str):
+    status = await interaction.followup.send(
+        f"⏳ Assigning 'Participant' role to {len(member_ids)} users...",
+        ephemeral=True,
+        wait=True)
+
+    job = await BulkRoleOperation(f"rolemessage:{message.id}",
+                                  interaction.guild, role,
+                                  "add").run(member_ids,
+                                             progress=lambda text: status.
+                                             edit(content=text))
+
+    text = f"✅ Assigned 'Participant' role to {job.done} users who reacted to the message's first reaction."
+    if job.failed:
+        text += f"\n⚠️ {len(job.failed)} failed, run the command again to retry them."
+    await status.edit(content=text)
+
+
+class EditEventModal(discord.ui.Modal, title="Edit Event"):
+    name = discord.ui.TextInput(label="Event Name")
+    info = discord.ui.TextInput(label="Description",
+                                style=discord.TextStyle.paragraph)
+    delay = discord.ui.TextInput(label="Time until event (e.g. 5m, 1h)",
+                                 required=False,
+                                 placeholder="Leave blank to keep")
+    participation = discord.ui.TextInput(label="Participation Reward",
+                                         required=False)
+
+    def __init__(self, state, event):
+        super().__init__()
+        self.state = state
+        self.event = event
+        self.name.default = event["name"]
+        self.info.default = event["info"]
+        self.participation.default = event.get("participation_reward", "")
+
+    async def on_submit(self, modal_interaction: discord.Interaction):
+        event = self.event
+        if self.delay.value.strip():
             try:
-                return datetime.fromisoformat(event["start_time"])
+                seconds = parse_time_delay(self.delay.value.strip())
             except ValueError:
-                return None
-        return event.get("start_time")
-
-    # Get user's editable upcoming events
-    editable = [(i, e) for i, e in enumerate(current_events)
-                if not e.get("started") and e["creator"]["id"] == user_id and (
-                    start := parse_start(e)) and start > now]
-
-    if not editable:
-        await interaction.followup.send("You have no upcoming events to edit.",
-                                        ephemeral=True)
-        return
-
-    class EditSelector(discord.ui.Select):
-
-        def __init__(self):
-            options = [
-                discord.SelectOption(label=e["name"], value=str(i))
-                for i, (i_orig, e) in enumerate(editable)
-            ]
-            super().__init__(placeholder="Choose an event to edit",
-                             options=options)
-
-        async def callback(self, select_interaction):
-            selected = int(self.values[0])
-            original_index, event = editable[selected]
-
-            class EditModal(discord.ui.Modal, title="Edit Event"):
-                name = discord.ui.TextInput(label="Event Name",
-                                            default=event["name"])
-                info = discord.ui.TextInput(label="Description",
-                                            default=event["info"],
-                                            style=discord.TextStyle.paragraph)
-                delay = discord.ui.TextInput(
-                    label="Time until event (e.g. 5m, 1h)",
-                    required=False,
-                    placeholder="Leave blank to keep")
-                participation = discord.ui.TextInput(
-                    label="Participation Reward",
-                    default=event.get("participation_reward", ""),
-                    required=False)
-
-                async def on_submit(self,
-                                    modal_interaction: discord.Interaction):
-                    event["name"] = self.name.value
-                    event["info"] = self.info.value
-                    event["participation_reward"] = self.participation.value
-
-                    if self.delay.value.strip():
-                        try:
-                            seconds = parse_time_delay(
-                                self.delay.value.strip())
-                            new_start = datetime.now(
-                                tz=timezone.utc) + timedelta(seconds=seconds)
-                            event["start_time"] = new_start
-                        except ValueError:
-                            await modal_interaction.response.send_message(
-                                "❌ Invalid delay format!", ephemeral=True)
-                            return
-
-                    # Update the event in the main list and save
-                    current_events[original_index] = event
-                    global events
-                    events = current_events
-                    save_events()
-                    await schedule_upcoming_events()
-                    await modal_interaction.response.send_message(
-                        f"✅ Event **{event['name']}** has been updated!",
-                        ephemeral=True)
-
-            await select_interaction.response.send_modal(EditModal())
-
-    class EditView(discord.ui.View):
-
-        def __init__(self):
-            super().__init__(timeout=60)
-            self.add_item(EditSelector())
-
-    await interaction.followup.send("Select the event to edit:",
-                                    view=EditView(),
-                                    ephemeral=True)
-
-
-@bot.tree.command(name="deleteevent",
-                  description="Mark one of your upcoming events as deleted",
-                  guild=discord.Object(id=GUILD_ID))
-@staff_only()
-async def deleteevent(interaction: discord.Interaction):
-    await interaction.response.defer(ephemeral=True)
+                await modal_interaction.response.send_message(
+                    "❌ Invalid delay format!", ephemeral=True)
+                return
+            event["start_time"] = datetime.now(
+                tz=timezone.utc) + timedelta(seconds=seconds)
+
+        event["name"] = self.name.value
+        event["info"] = self.info.value
+        event["participation_reward"] = self.participation.value
+
+        save_event(self.state, event)
+        self.state.scheduler.schedule(event["id"], event["start_time"])
+        await modal_interaction.response.send_message(
+            f"✅ Event **{event['name']}** has been updated!", ephemeral=True)
+
+
+class ConfirmDeleteModal(discord.ui.Modal, title="Confirm Delete Event"):
+    confirm = discord.ui.TextInput(label="Type DELETE to confirm",
+                                   placeholder="DELETE",
+                                   required=True)
+
+    def __init__(self, state, event):
+        super().__init__()
+        self.state = state
+        self.event = event
+
+    async def on_submit(self, modal_interaction: discord.Interaction):
+        event = self.event
+        if self.confirm.value.strip().upper() != "DELETE":
+            await modal_interaction.response.send_message(
+                "❌ Deletion cancelled.", ephemeral=True)
+            return
+
+        # Mark as deleted, compaction moves it to the archive
+        event["deleted"] = True
+        save_event(self.state, event)
+
+        # Cancel the pending announcement
+        if self.state.scheduler.cancel(event["id"]):
+            print(
+                f"🛑 Cancelled announcement for deleted event '{event['name']}'"
+            )
+        compact_events(self.state)
 
-    user_id = interaction.user.id
-    now = datetime.now(timezone.utc)
-    current_events = load_events()
+        await modal_interaction.response.send_message(
+            f"🗑️ Event **{event['name']}** has been marked as deleted.",
+            ephemeral=True)
 
-    global events
-    events = current_events
 
-    def parse_start(event):
-        if isinstance(event.get("start_time"), str):
-            try:
-                return datetime.fromisoformat(event["start_time"])
-            except ValueError:
-                return None
-        return event.get("start_time")
+MAX_SELECT_OPTIONS = 25  # Discord's limit for selects and autocomplete
 
-    deletable = [
-        (i, e) for i, e in enumerate(events)
-        if not e.get("started") and e["creator"]["id"] == user_id and (
-            start := parse_start(e)) and start > now
-    ]
 
-    if not deletable:
-        await interaction.followup.send(
-            "You have no upcoming events to delete.", ephemeral=True)
+def own_upcoming_events(interaction):
+    now = datetime.now(tz=timezone.utc)
+    return guilds[interaction.guild_id].store.upcoming_by(
+        interaction.user.id, now)
+
+
+async def own_event_autocomplete(interaction: discord.Interaction,
+                                 current: str):
+    prefix = current.lower()
+    choices = []
+    for e in own_upcoming_events(interaction):
+        if e["name"].lower().startswith(prefix):
+            label = f"{e['name']} ({e['start_time']:%Y-%m-%d %H:%M} UTC)"
+            choices.append(app_commands.Choice(name=label[:100],
+                                               value=e["id"]))
+            if len(choices) == MAX_SELECT_OPTIONS:
+                break
+    return choices
+
+
+def find_own_event(interaction, event_id):
+    """The caller's upcoming event with this id, or None."""
+    event = guilds[interaction.guild_id].store.get(event_id)
+    now = datetime.now(tz=timezone.utc)
+    if (event is None or event["creator"]["id"] != interaction.user.id
+            or not is_schedulable(event, now)):
+        return None
+    return event
+
+
+class OwnEventSelect(discord.ui.Select):
+    """Pick one of the caller's events, then open ``modal(state, event)``."""
+
+    def __init__(self, state, events, placeholder, modal):
+        self.state = state
+        self.events = {e["id"]: e for e in events[:MAX_SELECT_OPTIONS]}
+        self.modal = modal
+        options = [
+            discord.SelectOption(label=e["name"][:100], value=e["id"])
+            for e in self.events.values()
+        ]
+        super().__init__(placeholder=placeholder, options=options)
+
+    async def callback(self, select_interaction):
+        event = self.events[self.values[0]]
+        await select_interaction.response.send_modal(
+            self.modal(self.state, event))
+
+
+async def open_event_modal(interaction, event_id, action, modal):
+    """Shared flow for /editevent and /deleteevent."""
+    state = guilds[interaction.guild_id]
+    if event_id:
+        event = find_own_event(interaction, event_id)
+        if event is None:
+            await interaction.response.send_message(
+                "❌ That is not one of your upcoming events.", ephemeral=True)
+            return
+        await interaction.response.send_modal(modal(state, event))
         return
 
-    class DeleteSelector(discord.ui.Select):
-
-        def __init__(self):
-            options = [
-                discord.SelectOption(label=e["name"], value=str(i))
-                for i, (i_orig, e) in enumerate(deletable)
-            ]
-            super().__init__(placeholder="Choose an event to delete",
-                             options=options)
-
-        async def callback(self, select_interaction):
-            selected = int(self.values[0])
-            original_index, event = deletable[selected]
-
-            class ConfirmDeleteModal(discord.ui.Modal,
-                                     title="Confirm Delete Event"):
-                confirm = discord.ui.TextInput(label="Type DELETE to confirm",
-                                               placeholder="DELETE",
-                                               required=True)
-
-                async def on_submit(self,
-                                    modal_interaction: discord.Interaction):
-                    if self.confirm.value.strip().upper() != "DELETE":
-                        await modal_interaction.response.send_message(
-                            "❌ Deletion cancelled.", ephemeral=True)
-                        return
-
-                    # Mark as deleted (past timestamp)
-                    event["start_time"] = "2000-01-01T00:00:00+00:00"
-                    current_events[original_index] = event
-
-                    global events
-                    events = current_events
-                    save_events()
-
-                    # Cancel existing scheduled task
-                    task = scheduled_tasks.get(original_index)
-                    if task and not task.done():
-                        task.cancel()
-                        print(
-                            f"🛑 Cancelled announcement for deleted event '{event['name']}'"
-                        )
-
-                    # Reload and reschedule
-                    events = load_events()
-                    await schedule_upcoming_events()
+    events = own_upcoming_events(interaction)
+    if not events:
+        await interaction.response.send_message(
+            f"You have no upcoming events to {action}.", ephemeral=True)
+        return
 
-                    await modal_interaction.response.send_message(
-                        f"🗑️ Event **{event['name']}** has been marked as deleted.",
-                        ephemeral=True)
+    text = f"Select the event to {action}:"
+    if len(events) > MAX_SELECT_OPTIONS:
+        text += (f"\nShowing your next {MAX_SELECT_OPTIONS} of {len(events)}"
+                 " events, use the `event` option to search the rest.")
+    view = discord.ui.View(timeout=60)
+    view.add_item(
+        OwnEventSelect(state, events, f"Choose an event to {action}", modal))
+    await interaction.response.send_message(text, view=view, ephemeral=True)
 
-            await select_interaction.response.send_modal(ConfirmDeleteModal())
 
-    class DeleteView(discord.ui.View):
+@bot.tree.command(name="editevent",
+                  description="Edit one of your scheduled events",
+                  guilds=COMMAND_GUILDS)
+@app_commands.describe(event="The event to edit (type to search)")
+@app_commands.autocomplete(event=own_event_autocomplete)
+@staff_only()
+async def editevent(interaction: discord.Interaction, event: str = None):
+    await open_event_modal(interaction, event, "edit", EditEventModal)
 
-        def __init__(self):
-            super().__init__(timeout=60)
-            self.add_item(DeleteSelector())
 
-    await interaction.followup.send("Select the event to delete:",
-                                    view=DeleteView(),
-                                    ephemeral=True)
+@bot.tree.command(name="deleteevent",
+                  description="Mark one of your upcoming events as deleted",
+                  guilds=COMMAND_GUILDS)
+@app_commands.describe(event="The event to delete (type to search)")
+@app_commands.autocomplete(event=own_event_autocomplete)
+@staff_only()
+async def deleteevent(interaction: discord.Interaction, event: str = None):
+    await open_event_modal(interaction, event, "delete", ConfirmDeleteModal)
 
 
 @bot.tree.command(name="createevent",
                   description="Create an event",
-                  guild=discord.Object(id=GUILD_ID))
+                  guilds=COMMAND_GUILDS)
 @staff_only()
 async def createevent(interaction: discord.Interaction,
                       name: str,
@@ -549,6 +2730,7 @@ async def createevent(interaction: discord.Interaction,
     creator = {"id": interaction.user.id, "name": str(interaction.user)}
 
     event_data = {
+        "id": uuid.uuid4().hex,
         "name": name,
         "info": info,
         "reward1": reward1,
@@ -561,15 +2743,10 @@ async def createevent(interaction: discord.Interaction,
         "channel_id": interaction.channel_id
     }
 
-    events.append(event_data)
-    save_events()
+    state = guilds[interaction.guild_id]
+    save_event(state, event_data)
 
-    # Schedule with tracking
-    idx = len(events) - 1  # Index of the new event
-    existing_task = scheduled_tasks.get(idx)
-    if existing_task and not existing_task.done():
-        existing_task.cancel()
-    scheduled_tasks[idx] = asyncio.create_task(announce_event(event_data))
+    state.scheduler.schedule(event_data["id"], start_time)
 
     if delay_seconds > 0:
         await interaction.followup.send(
@@ -581,83 +2758,52 @@ async def createevent(interaction: discord.Interaction,
 @bot.tree.command(
     name="end",
     description="Sends the event info and clears the Participant role",
-    guild=discord.Object(id=GUILD_ID))
+    guilds=COMMAND_GUILDS)
 @staff_only()
 async def end(interaction: discord.Interaction):
-    now = datetime.now(tz=timezone.utc)
-    current_events = load_events()
-
     await interaction.response.send_message(
         "Ending event and removing Participant role.", ephemeral=True)
 
     # Remove "Participant" role from everyone who has it
     guild = interaction.guild
-    participant_role = discord.utils.get(guild.roles, name="Participant")
+    participant_role = resolver.participant_role(guild)
     if participant_role:
-        for member in guild.members:
-            if participant_role in member.roles:
-                try:
-                    await member.remove_roles(participant_role,
-                                              reason="Event ended")
-                    print(
-                        f"Removed Participant role from {member.display_name}")
-                except Exception as e:
-                    print(
-                        f"Failed to remove role from {member.display_name}: {e}"
-                    )
+        job = await BulkRoleOperation(
+            f"end:{participant_role.id}",
+            guild,
+            participant_role,
+            "remove",
+            reason="Event ended").run(
+                [m.id for m in participant_role.members],
+                progress=lambda text: interaction.edit_original_response(
+                    content=text))
+        print(
+            f"Removed Participant role from {job.done} member(s), {len(job.failed)} failed"
+        )
+        await interaction.edit_original_response(
+            content=
+            f"Event ended, removed Participant role from {job.done} member(s)."
+        )
     else:
         print("Participant role not found.")
 
-    # Prepare and send the embed
-    for e in current_events:
-        if isinstance(e["start_time"], str):
-            e["start_time"] = datetime.fromisoformat(e["start_time"])
-
-    upcoming = [
-        e for e in current_events if e["start_time"] > now and not e["started"]
-    ]
-
-    description_text = (
-        "This channel is temporarily closed until an event is being held. It will reopen once the event starts.\n"
-        "If you have any questions about upcoming events, feel free to ping the host, DM them, or ask in ⁠https://discord.com/channels/457619956687831050/666452996967628821\n\n"
-    )
-
-    if upcoming:
-        description_text += "🗓️ **Current Upcoming Events:**"
-    else:
-        description_text += "🚫 **There are currently no upcoming events scheduled via the bot.**"
-
-    embed = discord.Embed(title="🎉 Event Information",
-                          description=description_text,
-                          color=discord.Color.orange())
-
-    for e in upcoming:
-        embed.add_field(
-            name=e["name"],
-            value=
-            f"Starts <t:{int(e['start_time'].timestamp())}:F>\nCreated by: <@{e['creator']['id']}>\n",
-            inline=False)
-
-    embed.add_field(
-        name="",
-        value=
-        f"Keep an eye out for future events in here or ⁠https://discord.com/channels/457619956687831050/1349087527557922988! 👀",
-        inline=False)
-
     try:
-        await interaction.channel.send(embed=embed)
+        await interaction.channel.send(
+            **paged_message(guilds[interaction.guild_id].upcoming.pages(
+                render_end_pages)))
     except discord.InteractionResponded:
         pass
-        
+
 
 @bot.tree.command(
     name="eventping",
     description="Ping the Event Notifier role",
-    guild=discord.Object(id=GUILD_ID)
+    guilds=COMMAND_GUILDS
 )
 @staff_only()
 async def eventping(interaction: discord.Interaction):
-    role = interaction.guild.get_role(NOTIFIER_ROLE_ID)
+    config = guilds[interaction.guild_id].config
+    role = interaction.guild.get_role(config.notifier_role_id)
     if role is None:
         await interaction.response.send_message(
             "❌ Event Notifier role not found. Check the ID.", ephemeral=True
@@ -673,11 +2819,12 @@ async def eventping(interaction: discord.Interaction):
 @bot.tree.command(
     name="participantping",
     description="Ping the Participant role",
-    guild=discord.Object(id=GUILD_ID)
+    guilds=COMMAND_GUILDS
 )
 @staff_only()
 async def participantping(interaction: discord.Interaction):
-    role = interaction.guild.get_role(PARTICIPANT_ROLE_ID)
+    config = guilds[interaction.guild_id].config
+    role = interaction.guild.get_role(config.participant_role_id)
     if role is None:
         await interaction.response.send_message(
             "❌ Participant role not found. Check the ID.", ephemeral=True
@@ -697,7 +2844,7 @@ async def participantping(interaction: discord.Interaction):
 @bot.tree.command(
     name="eventroler",
     description="Send an Event Roler message to the current channel",
-    guild=discord.Object(id=GUILD_ID))
+    guilds=COMMAND_GUILDS)
 @staff_only()
 async def eventroler(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
@@ -718,6 +2865,7 @@ async def eventroler(interaction: discord.Interaction):
     embed.set_footer(text=f"Created by {interaction.user}")
 
     message = await channel.send(embed=embed)
+    announcement_messages.add(message.id)
     await message.add_reaction("\u2705")
 
     await interaction.followup.send(
@@ -725,32 +2873,15 @@ async def eventroler(interaction: discord.Interaction):
 
 @bot.tree.command(name="events",
                   description="Shows all upcoming events",
-                  guild=discord.Object(id=GUILD_ID))
+                  guilds=COMMAND_GUILDS)
 async def events_command(interaction: discord.Interaction):
-    now = datetime.now(tz=timezone.utc)
-    current_events = load_events()
-    for e in current_events:
-        if isinstance(e["start_time"], str):
-            e["start_time"] = datetime.fromisoformat(e["start_time"])
-
-    upcoming = [
-        e for e in current_events if e["start_time"] > now and not e["started"]
-    ]
-
-    if not upcoming:
+    pages = guilds[interaction.guild_id].upcoming.pages(render_events_pages)
+    if not pages:
         await interaction.response.send_message(
             "There are no upcoming events planned.")
         return
 
-    embed = discord.Embed(title="📅 Upcoming Events",
-                          color=discord.Color.green())
-    for e in upcoming:
-        embed.add_field(
-            name=e["name"],
-            value=
-            f"Starts <t:{int(e['start_time'].timestamp())}:F>\nCreated by: <@{e['creator']['id']}>",
-            inline=False)
-    await interaction.response.send_message(embed=embed)
+    await interaction.response.send_message(**paged_message(pages))
 
 
 @staff_only()
@@ -772,272 +2903,427 @@ async def editevent(interaction: discord.Interaction):
         return None
 
 
-async def bot_reacted_to_message(message):
-    for reaction in message.reactions:
-        if reaction.emoji == "✅":
-            async for user in reaction.users():
-                if user.id == bot.user.id:
-                    return True
-    return False
-
-
 @bot.event
 async def on_raw_reaction_add(payload):
     if payload.emoji.name != "✅" or payload.user_id == bot.user.id:
         return
 
-    channel = bot.get_channel(payload.channel_id)
-    if not channel:
-        return
-    try:
-        message = await channel.fetch_message(payload.message_id)
-    except:
-        return
-
-    if not await bot_reacted_to_message(message):
+    # Only announcements and prompts posted by the bot hand out the role
+    if (payload.guild_id not in guilds or not leader.is_leader
+            or not await is_prompt_message(payload)):
         return
 
-    guild = bot.get_guild(payload.guild_id)
-    if not guild:
-        return
-    member = guild.get_member(payload.user_id)
-    if not member:
-        return
-    role = discord.utils.get(guild.roles, name="Participant")
-    if role and role not in member.roles:
-        await member.add_roles(role)
-        print(f"✅ Assigned Participant role to {member.display_name}")
+    started = time.perf_counter()
+    try:
+        guild = bot.get_guild(payload.guild_id)
+        if not guild:
+            return
+        member = payload.member or guild.get_member(payload.user_id)
+        if not member:
+            return
+        role = resolver.participant_role(guild)
+        if role and member.get_role(role.id) is None:
+            await member.add_roles(role)
+            ROLE_OPERATIONS.inc(action="add", result="ok")
+            print(f"✅ Assigned Participant role to {member.display_name}")
+    finally:
+        REACTION_LATENCY.observe(time.perf_counter() - started, action="add")
 
 
 @bot.event
 async def on_raw_reaction_remove(payload):
     if payload.emoji.name != "✅":
         return
+    if (payload.guild_id not in guilds or not leader.is_leader
+            or not await is_prompt_message(payload)):
+        return
+    started = time.perf_counter()
     guild = bot.get_guild(payload.guild_id)
     member = guild.get_member(payload.user_id) if guild else None
-    role = discord.utils.get(guild.roles,
-                             name="Participant") if guild else None
-    if member and role and role in member.roles:
+    role = resolver.participant_role(guild) if guild else None
+    if member and role and member.get_role(role.id) is not None:
         await member.remove_roles(role)
+        ROLE_OPERATIONS.inc(action="remove", result="ok")
         print(f"❎ Removed Participant role from {member.display_name}")
+    REACTION_LATENCY.observe(time.perf_counter() - started, action="remove")
+
+
+@bot.event
+async def on_guild_join(guild):
+    resolver.refresh(guild)
+
+
+@bot.event
+async def on_guild_role_create(role):
+    resolver.refresh(role.guild)
+
+
+@bot.event
+async def on_guild_role_delete(role):
+    resolver.refresh(role.guild)
+
+
+@bot.event
+async def on_guild_role_update(before, after):
+    # Renames change the Participant lookup, permission edits the fallback
+    resolver.refresh(after.guild)
+
+
+@bot.event
+async def on_guild_channel_create(channel):
+    resolver.refresh_channels(channel.guild)
+
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    resolver.refresh_channels(channel.guild)
+
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    resolver.refresh_channels(after.guild)
 
 
 # --- EVENT PLANNER (claim/unclaim) ---
-EVENTPLANNER_FILE = "eventplanner.json"
-EVENTPLANNER_REPO_URL = "https://api.github.com/repos/CuriousWonder1/Discord-bot/contents/eventplanner.json"
-
-
-def fetch_github_planner():
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
-        print("❌ GITHUB_TOKEN not set for eventplanner!")
-        return {}
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(EVENTPLANNER_REPO_URL, headers=headers)
-    if resp.status_code == 200:
-        content = resp.json()["content"]
-        return json.loads(base64.b64decode(content).decode())
-    return {}
-
-
-def commit_github_planner(data):
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
-        print("❌ GITHUB_TOKEN not set for eventplanner!")
-        return
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    get_resp = requests.get(EVENTPLANNER_REPO_URL, headers=headers)
-    sha = get_resp.json().get("sha") if get_resp.status_code == 200 else None
-    content = base64.b64encode(json.dumps(data, indent=2).encode()).decode()
-    payload = {
-        "message": "Update eventplanner",
-        "content": content,
-        "branch": "main"
-    }
-    if sha: payload["sha"] = sha
-    put_resp = requests.put(EVENTPLANNER_REPO_URL,
-                            headers=headers,
-                            json=payload)
-    if put_resp.status_code in (200, 201):
-        print("✅ eventplanner.json updated on GitHub.")
-    else:
-        print("❌ Failed to update eventplanner.json:", put_resp.status_code,
-              put_resp.text)
+class PlannerCache:
+    """In-memory copy of eventplanner.json.
+
+    Reads are served from memory and revalidated with a conditional GET once
+    ``ttl`` seconds have passed. ``update()`` writes against the SHA the
+    cached copy was read at and, when someone else committed in between,
+    reloads and applies the change again instead of overwriting theirs.
+    """
+
+    def __init__(self, path, ttl=60, retries=3):
+        self.path = path
+        self.ttl = ttl
+        self.retries = retries
+        self.data = None
+        self.version = 0  # bumped whenever the cached copy changes
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._fetched_at = 0.0
+
+    async def _revalidate(self):
+        status, data, sha = await github.read_if_changed(self.path)
+        if status == "unchanged" and self.data is None:
+            # Known SHA but nothing cached yet, e.g. after a restart
+            data, sha = await github.get_file(self.path, default={})
+            status = "failed" if data is None else "changed"
+            github.remember_sha(self.path, sha)
+        if status == "failed":
+            return False
+        if status != "unchanged":
+            self.data = data if status == "changed" else {}
+            self.version += 1
+        self._fetched_at = time.monotonic()
+        return True
+
+    async def get(self):
+        """The cached planner; raises ``RuntimeError`` if it was never read.
+
+        A failed revalidation keeps serving the last copy read and retries
+        on the next call.
+        """
+        if self.data is None or time.monotonic() - self._fetched_at > self.ttl:
+            if not await self._revalidate() and self.data is None:
+                raise RuntimeError("eventplanner.json could not be read")
+        return self.data
+
+    async def update(self, mutate):
+        """Apply ``mutate(schedule)`` and commit the result.
+
+        ``mutate`` works on a copy and returns ``(changed, result)``; the
+        result is handed back to the caller. Raises ``RuntimeError`` if the
+        commit keeps failing.
+        """
+        async with self._lock:
+            for attempt in range(1, self.retries + 1):
+                schedule = json.loads(json.dumps(await self.get()))
+                changed, result = mutate(schedule)
+                if not changed:
+                    return result
+
+                put_resp = await github.put_file(
+                    self.path,
+                    json.dumps(schedule, indent=2).encode(),
+                    "Update eventplanner", github.known_sha(self.path))
+                if put_resp is not None and put_resp.status in (200, 201):
+                    self.data = schedule
+                    self.version += 1
+                    print("✅ eventplanner.json updated on GitHub.")
+                    return result
+                if put_resp is not None and put_resp.status in (409, 422):
+                    print(
+                        f"⚠️ eventplanner.json changed remotely, reapplying (attempt {attempt})"
+                    )
+                    self.invalidate()
+                    continue
+                if put_resp is not None:
+                    print("❌ Failed to update eventplanner.json:",
+                          put_resp.status, put_resp.text)
+                break
+        raise RuntimeError("eventplanner.json could not be updated")
+
+
+
+
+PLANNER_HORIZON_MONTHS = int(os.getenv("PLANNER_HORIZON_MONTHS", "2"))
+
+
+def parse_month_key(key):
+    year, month = map(int, key.split("-"))
+    return year, month
+
+
+def add_months(year, month, count):
+    index = year * 12 + month - 1 + count
+    return index // 12, index % 12 + 1
 
 
 def generate_month(year, month):
+    """Weeks of seven days from the 1st; a short last week is merged into the one before."""
     import calendar
-    weeks = []
     _, days_in_month = calendar.monthrange(year, month)
-    start_day = 1
-
-    while start_day <= days_in_month:
-        end_day = start_day + 6
-        if end_day > days_in_month:
-            # Merge remaining days into the last week
-            if weeks:
-                weeks[-1]["range"] = f"{weeks[-1]['range'].split('-')[0]}-{days_in_month} {calendar.month_name[month]} {year}"
-            else:
-                # if it's the first week and month < 7 days, just make a week
-                weeks.append({
-                    "range": f"{start_day}-{days_in_month} {calendar.month_name[month]} {year}",
-                    "slots": [None, None]
-                })
+    weeks = []
+    for start_day in range(1, days_in_month + 1, 7):
+        end_day = min(start_day + 6, days_in_month)
+        if end_day - start_day < 6 and weeks:
+            weeks[-1]["end"] = date(year, month, end_day).isoformat()
             break
         weeks.append({
-            "range": f"{start_day}-{end_day} {calendar.month_name[month]} {year}",
+            "start": date(year, month, start_day).isoformat(),
+            "end": date(year, month, end_day).isoformat(),
             "slots": [None, None]
         })
-        start_day += 7
     return weeks
 
 
-from datetime import datetime
-
-
-
-
+def migrate_week(week, month_key):
+    """Convert a legacy {"range": "22-30 November 2025"} week in place."""
+    if "start" in week:
+        return False
+    year, month = parse_month_key(month_key)
+    start_day, end_day = week.pop("range").split()[0].split("-")
+    week["start"] = date(year, month, int(start_day)).isoformat()
+    week["end"] = date(year, month, int(end_day)).isoformat()
+    return True
 
-def ensure_schedule():
-    """Ensure schedule contains full current + next month; old weeks remain in file but are pruned only if month is before current."""
-    schedule = fetch_github_planner()
-    now = datetime.now()
-    year, month = now.year, now.month
-    next_month = month + 1 if month < 12 else 1
-    next_year = year if month < 12 else year + 1
 
-    # Add months if missing
-    for y, m in [(year, month), (next_year, next_month)]:
-        key = f"{y}-{m}"
+def week_label(week):
+    import calendar
+    start = date.fromisoformat(week["start"])
+    end = date.fromisoformat(week["end"])
+    return f"{start.day}-{end.day} {calendar.month_name[start.month]} {start.year}"
+
+
+class PlannerCalendar:
+    """Month-ordered view over a planner schedule with a date -> week index."""
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.months = sorted(schedule, key=parse_month_key)
+        self._by_date = {}  # date -> (month key, week number, week)
+        for key in self.months:
+            for number, week in enumerate(schedule[key], 1):
+                day = date.fromisoformat(week["start"])
+                end = date.fromisoformat(week["end"])
+                while day <= end:
+                    self._by_date[day] = (key, number, week)
+                    day += timedelta(days=1)
+
+    def week_of(self, day):
+        """(month key, week number, week) containing ``day``, or None."""
+        return self._by_date.get(day)
+
+    def future_weeks(self, month_key, today):
+        """(week number, week) pairs ending today or later, keeping original numbers."""
+        return future_weeks(self.schedule[month_key], today)
+
+
+def future_weeks(weeks, today):
+    today = today.isoformat()
+    return [(number, week) for number, week in enumerate(weeks, 1)
+            if week["end"] >= today]
+
+
+def ensure_schedule(schedule):
+    """Fill in the planning horizon, migrate legacy weeks and prune past months."""
+    today = date.today()
+    for offset in range(PLANNER_HORIZON_MONTHS):
+        year, month = add_months(today.year, today.month, offset)
+        key = f"{year}-{month}"
         if key not in schedule:
-            schedule[key] = generate_month(y, m)
+            schedule[key] = generate_month(year, month)
 
-    # Prune only completely old months (not individual weeks)
     for key in list(schedule.keys()):
-        y, m = map(int, key.split("-"))
-        if y < year or (y == year and m < month):
+        if parse_month_key(key) < (today.year, today.month):
             del schedule[key]
+            continue
+        for week in schedule[key]:
+            migrate_week(week, key)
 
     return schedule
 
-def filter_future_weeks(weeks, month_key):
-    """Return only weeks whose end date is today or later, but keep original week numbers."""
-    now = datetime.now()
-    filtered = []
-    for idx, week in enumerate(weeks):
-        week_number = idx + 1
-        # Determine week end date from range string
-        end_day = int(week["range"].split("-")[1].split()[0])
-        year, month = map(int, month_key.split("-"))
-        week_end_date = datetime(year=year, month=month, day=end_day)
-        if week_end_date >= now:
-            filtered.append((week_number, week))
-    return filtered
+
+async def current_calendar(state):
+    """Calendar over the cached planner, rebuilt only when it or the date changes."""
+    planner = state.planner
+    schedule = await planner.get()
+    version, day, cal = state.calendar
+    if version != planner.version or day != date.today():
+        cal = PlannerCalendar(ensure_schedule(json.loads(json.dumps(schedule))))
+        state.calendar = (planner.version, date.today(), cal)
+    return cal
+
+
+def find_week_slots(schedule, month_index, week):
+    """Return (month_key, slots) for a claimable week, or (None, error message)."""
+    # Only the claimed month is looked at, no date index needed
+    months = sorted(schedule, key=parse_month_key)
+
+    if month_index < 1 or month_index > len(months):
+        return None, f"❌ Invalid month index. Choose 1 to {len(months)}."
+
+    month_key = months[month_index - 1]
+    weeks = dict(future_weeks(schedule[month_key], date.today()))
+
+    if week not in weeks:
+        return None, "❌ This week has already passed or is invalid."
+
+    return month_key, weeks[week]["slots"]
+
+
+PLANNER_UNAVAILABLE = "❌ Couldn't load the planner from GitHub, please try again."
+
+
+async def update_planner(interaction, mutate):
+    planner = guilds[interaction.guild_id].planner
+    try:
+        await planner.get()
+    except RuntimeError:
+        await interaction.followup.send(PLANNER_UNAVAILABLE, ephemeral=True)
+        return
+    try:
+        message = await planner.update(
+            lambda schedule: mutate(ensure_schedule(schedule)))
+    except RuntimeError:
+        message = "❌ Couldn't save the planner, please try again."
+    await interaction.followup.send(message, ephemeral=True)
 
 # --- EVENTPLANNER COMMAND ---
 @bot.tree.command(
     name="eventplanner",
-    description="Show the event schedule for this and next month",
-    guild=discord.Object(id=GUILD_ID)
+    description="Show the upcoming event schedule",
+    guilds=COMMAND_GUILDS
 )
 async def eventplanner(interaction: discord.Interaction):
-    schedule = ensure_schedule()
-    embed = discord.Embed(title="📅 Event Planner", color=discord.Color.blue())
+    await interaction.response.defer(ephemeral=True)
+    try:
+        cal = await current_calendar(guilds[interaction.guild_id])
+    except RuntimeError:
+        await interaction.followup.send(PLANNER_UNAVAILABLE, ephemeral=True)
+        return
+    today = date.today()
+    this_week = cal.week_of(today)
+    pages = [discord.Embed(title="📅 Event Planner", color=discord.Color.blue())]
 
-    for month_key, weeks in schedule.items():
-        future_weeks = filter_future_weeks(weeks, month_key)
+    for month_key in cal.months:
+        future_weeks = cal.future_weeks(month_key, today)
         if not future_weeks:
             continue  # skip months with no upcoming weeks
 
+        # Keep each month on one page, within Discord's 25 fields per embed
+        if len(pages[-1].fields) + len(future_weeks) + 1 > 25:
+            pages.append(discord.Embed(title="📅 Event Planner", color=discord.Color.blue()))
+        embed = pages[-1]
         embed.add_field(name=f"**{month_key}**", value="\u200b", inline=False)
         for week_number, week in future_weeks:
             claims = ", ".join(u if u else "[Open]" for u in week["slots"])
+            current = " (this week)" if this_week and this_week[2] is week else ""
             embed.add_field(
-                name=f"Week {week_number} ({week['range']})",
+                name=f"Week {week_number} ({week_label(week)}){current}",
                 value=f"Slots: {claims}",
                 inline=False
             )
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    if len(pages) > 1:
+        for number, embed in enumerate(pages, 1):
+            embed.set_footer(text=f"Page {number}/{len(pages)}")
+    await interaction.followup.send(**paged_message(pages), ephemeral=True)
 
 # --- CLAIM COMMAND ---
 @bot.tree.command(
     name="claim",
     description="Claim a week slot",
-    guild=discord.Object(id=GUILD_ID)
+    guilds=COMMAND_GUILDS
 )
 @staff_only()
 @app_commands.describe(
-    month_index="1 = first month, 2 = second month",
+    month_index="1 = this month, 2 = next month, and so on",
     week="Week number in the month (original number)"
 )
 async def claim(interaction: discord.Interaction, month_index: int, week: int):
-    schedule = ensure_schedule()
-    months = list(schedule.keys())
-
-    if month_index < 1 or month_index > len(months):
-        return await interaction.response.send_message("❌ Invalid month index. Choose 1 or 2.", ephemeral=True)
-
-    month_key = months[month_index - 1]
-    weeks = schedule[month_key]
-    future_weeks = dict(filter_future_weeks(weeks, month_key))
-
-    if week not in future_weeks:
-        return await interaction.response.send_message("❌ This week has already passed or is invalid.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    name = interaction.user.display_name
 
-    slots = future_weeks[week]["slots"]
-    if interaction.user.display_name in slots:
-        return await interaction.response.send_message("❌ You already claimed this slot.", ephemeral=True)
+    def apply(schedule):
+        month_key, slots = find_week_slots(schedule, month_index, week)
+        if month_key is None:
+            return False, slots
+        if name in slots:
+            return False, "❌ You already claimed this slot."
+        if None not in slots:
+            return False, "❌ Both slots are already filled."
+        slots[slots.index(None)] = name
+        return True, f"✅ You claimed week {week} of {month_key}."
 
-    try:
-        idx = slots.index(None)
-        slots[idx] = interaction.user.display_name
-        commit_github_planner(schedule)
-        await interaction.response.send_message(f"✅ You claimed week {week} of {month_key}.", ephemeral=True)
-    except ValueError:
-        await interaction.response.send_message("❌ Both slots are already filled.", ephemeral=True)
+    await update_planner(interaction, apply)
 
 # --- UNCLAIM COMMAND ---
 @bot.tree.command(
     name="unclaim",
     description="Unclaim your week slot",
-    guild=discord.Object(id=GUILD_ID)
+    guilds=COMMAND_GUILDS
 )
 @staff_only()
 @app_commands.describe(
-    month_index="1 = first month, 2 = second month",
+    month_index="1 = this month, 2 = next month, and so on",
     week="Week number in the month (original number)"
 )
 async def unclaim(interaction: discord.Interaction, month_index: int, week: int):
-    schedule = ensure_schedule()
-    months = list(schedule.keys())
+    await interaction.response.defer(ephemeral=True)
+    name = interaction.user.display_name
 
-    if month_index < 1 or month_index > len(months):
-        return await interaction.response.send_message("❌ Invalid month index. Choose 1 or 2.", ephemeral=True)
+    def apply(schedule):
+        month_key, slots = find_week_slots(schedule, month_index, week)
+        if month_key is None:
+            return False, slots
+        if name not in slots:
+            return False, "❌ You didn't claim this week."
+        slots[slots.index(name)] = None
+        return True, f"✅ You unclaimed week {week} of {month_key}."
 
-    month_key = months[month_index - 1]
-    weeks = schedule[month_key]
-    future_weeks = dict(filter_future_weeks(weeks, month_key))
+    await update_planner(interaction, apply)
 
-    if week not in future_weeks:
-        return await interaction.response.send_message("❌ This week has already passed or is invalid.", ephemeral=True)
 
-    slots = future_weeks[week]["slots"]
-    if interaction.user.display_name in slots:
-        slots[slots.index(interaction.user.display_name)] = None
-        commit_github_planner(schedule)
-        await interaction.response.send_message(f"✅ You unclaimed week {week} of {month_key}.", ephemeral=True)
-    else:
-        await interaction.response.send_message("❌ You didn't claim this week.", ephemeral=True)
+
+guilds = {
+    guild_id: GuildState(config)
+    for guild_id, config in GUILD_CONFIGS.items() if owns_guild(guild_id)
+}
 
 
+if __name__ == "__main__":
+    if leader.enabled and LEADER_LEASE_BRANCH in (None, "", GITHUB_BRANCH):
+        sys.exit("❌ LEADER_ELECTION=1 needs LEADER_LEASE_BRANCH set to a "
+                 f"dedicated branch, not {GITHUB_BRANCH}")
 
-keep_alive()
-print("🔁 Starting bot...")
-bot.run(os.getenv("DISCORD_TOKEN"))
+    for state in guilds.values():
+        state.store.load()
+        github.remember_sha(state.store.path, state.store.remote_sha)
+    announcement_messages.load()
 
-port = int(os.environ.get(
-    "PORT", 8080))  # Use Render's assigned port or default to 8080
-app.run(host='0.0.0.0', port=port)
+    print("🔁 Starting bot...")
+    bot.run(os.getenv("DISCORD_TOKEN"))
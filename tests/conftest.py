@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# main.py keeps its local store in the working directory
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from benchmark import FakeGitHub  # noqa: E402
+
+
+@pytest.fixture
+def fake_github(monkeypatch):
+    """Runs ``scenario(fake)`` with main.py talking to a local FakeGitHub.
+
+    Each run gets a fresh client and rate-limit budget.
+    """
+    monkeypatch.setenv("GITHUB_TOKEN", "test")
+    monkeypatch.setattr(main, "github_budget", main.RateLimitBudget())
+
+    def run(scenario):
+
+        async def wrapper():
+            fake = FakeGitHub()
+            await fake.start()
+            monkeypatch.setattr(main, "GITHUB_API_URL", fake.url)
+            monkeypatch.setattr(main, "github",
+                                main.GitHubStorage(main.GITHUB_REPO))
+            try:
+                return await scenario(fake)
+            finally:
+                await main.github.close()
+                await fake.stop()
+
+        return asyncio.run(wrapper())
+
+    return run
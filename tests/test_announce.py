@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+
+def soon(seconds):
+    return datetime.now(tz=timezone.utc) + timedelta(seconds=seconds)
+
+
+def event(**fields):
+    return {
+        "id": "quiz",
+        "name": "Quiz",
+        "info": "Answer questions",
+        "start_time": datetime.now(tz=timezone.utc),
+        "creator": {"id": 1, "name": "host"},
+        **fields
+    }
+
+
+class FakeMessage:
+
+    def __init__(self, message_id, reaction_error=None):
+        self.id = message_id
+        self.reactions = []
+        self.reaction_error = reaction_error
+
+    async def add_reaction(self, emoji):
+        if self.reaction_error is not None:
+            raise self.reaction_error
+        self.reactions.append(emoji)
+
+
+class FakeChannel:
+
+    def __init__(self):
+        self.sent = []
+        self.reaction_error = None
+
+    async def send(self, content, embed=None, allowed_mentions=None):
+        message = FakeMessage(len(self.sent) + 1, self.reaction_error)
+        self.sent.append((content, embed, message))
+        return message
+
+
+@pytest.fixture
+def announcing(monkeypatch, tmp_path):
+    """Stubs out rendering and persistence around announce_event()."""
+    calls = {"prepare": [], "save": [], "compact": 0}
+    channel = FakeChannel()
+
+    def prepare(state, e):
+        calls["prepare"].append(e["name"])
+        return main.PreparedAnnouncement(main.announcement_key(e), channel,
+                                         "fresh", None)
+
+    def compact(state):
+        calls["compact"] += 1
+
+    monkeypatch.setattr(main, "prepare_announcement", prepare)
+    monkeypatch.setattr(main, "save_event",
+                        lambda state, e: calls["save"].append(dict(e)))
+    monkeypatch.setattr(main, "compact_events", compact)
+    monkeypatch.setattr(main, "announcement_messages",
+                        main.MessageRegistry(str(tmp_path / "messages.txt")))
+    state = SimpleNamespace(prepared={})
+    return state, channel, calls
+
+
+def test_prepare_runs_lead_before_the_start():
+    prepared = []
+    fired = []
+
+    async def callback(event_id):
+        fired.append(datetime.now(tz=timezone.utc))
+
+    async def scenario():
+        scheduler = main.AnnouncementScheduler(
+            callback,
+            prepare=lambda event_id: prepared.append(
+                (event_id, datetime.now(tz=timezone.utc))),
+            lead=timedelta(seconds=0.15))
+        start = soon(0.25)
+        scheduler.schedule("quiz", start)
+        await asyncio.sleep(0.4)
+        return start
+
+    start = asyncio.run(scenario())
+    assert [event_id for event_id, _ in prepared] == ["quiz"]
+    assert start - timedelta(seconds=0.15) <= prepared[0][1] < start
+    assert len(fired) == 1 and fired[0] >= start
+
+
+def test_prepare_skips_cancelled_and_follows_rescheduled_events():
+    prepared = []
+
+    async def callback(event_id):
+        pass
+
+    async def scenario():
+        scheduler = main.AnnouncementScheduler(callback,
+                                               prepare=prepared.append,
+                                               lead=timedelta(seconds=0.1))
+        scheduler.schedule("cancelled", soon(0.15))
+        scheduler.schedule("moved", soon(0.15))
+        scheduler.cancel("cancelled")
+        scheduler.schedule("moved", soon(10))
+        await asyncio.sleep(0.25)
+
+    asyncio.run(scenario())
+    assert prepared == []
+
+
+def test_announce_uses_the_prepared_render(announcing):
+    state, channel, calls = announcing
+    e = event()
+    state.prepared["quiz"] = main.PreparedAnnouncement(
+        main.announcement_key(e), channel, "prepared", None)
+
+    asyncio.run(main.announce_event(state, e))
+
+    assert calls["prepare"] == []
+    assert [content for content, _, _ in channel.sent] == ["prepared"]
+    assert channel.sent[0][2].reactions == ["✅"]
+    assert calls["save"][0]["started"] and calls["compact"] == 1
+    assert state.prepared == {}
+
+
+def test_announce_discards_a_render_of_an_edited_event(announcing):
+    state, channel, calls = announcing
+    original = event()
+    state.prepared["quiz"] = main.PreparedAnnouncement(
+        main.announcement_key(original), channel, "stale", None)
+
+    asyncio.run(main.announce_event(state, event(info="New rules")))
+
+    assert calls["prepare"] == ["Quiz"]
+    assert [content for content, _, _ in channel.sent] == ["fresh"]
+
+
+def test_announce_compacts_even_if_the_reaction_fails(announcing):
+    state, channel, calls = announcing
+    channel.reaction_error = RuntimeError("Missing Permissions")
+
+    asyncio.run(main.announce_event(state, event()))
+
+    assert len(channel.sent) == 1
+    assert calls["save"][0]["started"] and calls["compact"] == 1
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+import main
+
+
+def budget(remaining, reset_in, limit=5000):
+    b = main.RateLimitBudget(write_reserve=100)
+    b.update(200, {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(time.time() + reset_in),
+    })
+    return b
+
+
+def test_poll_interval_without_headers_is_the_base():
+    assert main.RateLimitBudget().poll_interval(30) == 30
+
+
+def test_poll_interval_spreads_the_spare_budget():
+    # 1000 spare requests over an hour: one poll every 3.6s, floored at base
+    assert budget(1100, 3600).poll_interval(1) == pytest.approx(3.6, abs=0.05)
+    assert budget(1100, 3600).poll_interval(30) == 30
+
+
+def test_poll_interval_is_shared_between_pollers():
+    assert budget(1100, 3600).poll_interval(1, pollers=4) == pytest.approx(
+        14.4, abs=0.05)
+
+
+def test_poll_interval_waits_for_the_window_in_the_reserve():
+    assert budget(50, 600).poll_interval(30) == pytest.approx(600, abs=1)
+
+
+def test_poll_interval_after_the_window_reset():
+    assert budget(0, -1).poll_interval(30) == 30
+
+
+def test_allow_keeps_the_reserve_for_writes():
+    b = budget(50, 600)
+    assert not b.allow(poll=True)
+    assert b.allow(poll=False)
+    assert not budget(0, 600).allow(poll=False)
+
+
+def test_retry_after_blocks_everything():
+    b = main.RateLimitBudget()
+    b.update(403, {"Retry-After": "60"})
+    assert not b.allow(poll=False)
+    assert b.poll_interval(30) >= 59
+
+
+def test_only_background_syncs_give_way_in_the_reserve(fake_github,
+                                                       monkeypatch):
+    monkeypatch.setattr(main, "github_budget", budget(50, 600))
+
+    async def scenario(fake):
+        fake.write("events.json", b"[]")
+        fake.write("eventplanner.json", b"{}")
+        polled = await main.github.read_if_changed("events.json", poll=True)
+        planner = await main.PlannerCache("eventplanner.json").get()
+        return polled[0], planner, sum(fake.calls.values())
+
+    polled, planner, calls = fake_github(scenario)
+    assert polled == "failed"
+    assert planner == {}
+    assert calls == 1
@@ -0,0 +1,81 @@
+import main
+
+
+def queue_for(contents, **kwargs):
+    commits = []
+    queue = main.CommitQueue(
+        "data.json",
+        "Update data",
+        lambda: (contents[-1], len(contents)),
+        on_commit=lambda version, sha, raw: commits.append(version),
+        delay=0.01,
+        **kwargs)
+    return queue, commits
+
+
+def test_requests_coalesce_into_one_put(fake_github):
+    contents = [b"1"]
+    queue, commits = queue_for(contents)
+
+    async def scenario(fake):
+        fake.write("data.json", b"0")
+        main.github.remember_sha("data.json", fake.sha(b"0"))
+        for value in (b"2", b"3", b"4"):
+            contents.append(value)
+            queue.request()
+        await queue._task
+        return fake.files["data.json"], fake.calls
+
+    raw, calls = fake_github(scenario)
+    assert raw == b"4"
+    assert calls[("PUT", "data.json")] == 1
+    assert commits == [4]
+
+
+def test_later_commits_reuse_our_own_sha(fake_github):
+    contents = [b"1"]
+    queue, _ = queue_for(contents)
+
+    async def scenario(fake):
+        fake.write("data.json", b"0")
+        main.github.remember_sha("data.json", fake.sha(b"0"))
+        for value in (b"2", b"3"):
+            contents.append(value)
+            queue.request()
+            assert await queue.flush()
+        return fake.calls
+
+    calls = fake_github(scenario)
+    assert calls[("PUT", "data.json")] == 2
+    assert calls[("GET", "data.json")] == 0
+
+
+def test_unknown_sha_is_never_overwritten_without_resolve(fake_github):
+    queue, _ = queue_for([b"ours"])
+
+    async def scenario(fake):
+        fake.write("data.json", b"theirs")
+        queue.request()
+        ok = await queue.flush()
+        return ok, fake.files["data.json"]
+
+    ok, raw = fake_github(scenario)
+    assert not ok and queue.pending
+    assert raw == b"theirs"
+
+
+def test_exception_keeps_the_change_pending(fake_github):
+
+    async def broken_resolve():
+        raise ValueError("malformed remote copy")
+
+    queue, commits = queue_for([b"ours"], resolve=broken_resolve)
+
+    async def scenario(fake):
+        queue.request()
+        queue._task.cancel()
+        return await queue.flush()
+
+    assert fake_github(scenario) is False
+    assert queue.pending
+    assert commits == []
@@ -0,0 +1,179 @@
+import asyncio
+import itertools
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import main
+
+guild_ids = itertools.count(900)
+
+
+def remote_event(**fields):
+    start = datetime.now(tz=timezone.utc) + timedelta(days=1)
+    return {
+        "id": "quiz",
+        "name": "Quiz",
+        "start_time": start.isoformat(),
+        "creator": {"id": 1, "name": "host"},
+        **fields
+    }
+
+
+def new_state():
+    return main.GuildState(main.GuildConfig(next(guild_ids), [], None, None,
+                                            None))
+
+
+def lease(ttl=6.0, instance_id="me"):
+    return main.LeaderLease(main.github, "leader.json", instance_id, ttl=ttl,
+                            margin=0.5)
+
+
+def read_lease(fake):
+    return json.loads(fake.files["leader.json"])
+
+
+def test_acquires_a_missing_lease_and_renews_it(fake_github):
+
+    async def scenario(fake):
+        me = lease()
+        first = await me._step()
+        holder = read_lease(fake)["holder"]
+        second = await me._step()
+        return me.is_leader, first, second, holder, fake.calls
+
+    is_leader, first, second, holder, calls = fake_github(scenario)
+    assert is_leader and holder == "me"
+    assert first == second == 2.0
+    # The renewal reuses the SHA of our own write, no read
+    assert calls[("GET", "leader.json")] == 1
+    assert calls[("PUT", "leader.json")] == 2
+
+
+def test_stands_by_while_another_lease_is_valid(fake_github):
+
+    async def scenario(fake):
+        expires = time.time() + 5
+        fake.write("leader.json",
+                   json.dumps({"holder": "other", "expires": expires}).encode())
+        me = lease()
+        return me.is_leader, await me._step(), read_lease(fake)["holder"]
+
+    is_leader, wait, holder = fake_github(scenario)
+    assert not is_leader and holder == "other"
+    assert 4 < wait <= 5.5
+
+
+def test_takes_over_an_expired_lease(fake_github):
+
+    async def scenario(fake):
+        fake.write("leader.json",
+                   json.dumps({"holder": "other", "expires": 1}).encode())
+        me = lease()
+        await me._step()
+        return me.is_leader, read_lease(fake)["holder"]
+
+    assert fake_github(scenario) == (True, "me")
+
+
+def test_renewal_fails_after_someone_else_wrote(fake_github):
+
+    async def scenario(fake):
+        me = lease()
+        await me._step()
+        fake.write("leader.json",
+                   json.dumps({"holder": "other", "expires": 2e9}).encode())
+        await me._step()
+        return me.is_leader, read_lease(fake)["holder"]
+
+    assert fake_github(scenario) == (False, "other")
+
+
+def test_run_survives_a_malformed_lease(fake_github):
+
+    async def scenario(fake):
+        fake.write("leader.json", b"{not json")
+        me = lease()
+        me.ERROR_DELAY = 0.01
+        task = asyncio.create_task(me.run())
+        await asyncio.sleep(0.05)
+        alive = not task.done()
+        fake.write("leader.json", b"{}")
+        leading = await me.wait_until_leader(1)
+        task.cancel()
+        return alive, leading
+
+    assert fake_github(scenario) == (True, True)
+
+
+def test_claim_marks_the_event_started(fake_github):
+    state = new_state()
+
+    async def scenario(fake):
+        fake.write(state.config.events_file,
+                   json.dumps([remote_event()]).encode())
+        claimed = await main.claim_announcement(state, "quiz")
+        return claimed, json.loads(fake.files[state.config.events_file])
+
+    claimed, remote = fake_github(scenario)
+    assert claimed["started"]
+    assert remote[0]["started"] and remote[0]["announced_by"] == main.INSTANCE_ID
+    assert state.store.get("quiz")["started"]
+
+
+def test_claim_skips_an_event_another_replica_claimed(fake_github):
+    state = new_state()
+
+    async def scenario(fake):
+        fake.write(state.config.events_file,
+                   json.dumps([remote_event(started=True)]).encode())
+        claimed = await main.claim_announcement(state, "quiz")
+        return claimed, fake.calls[("PUT", state.config.events_file)]
+
+    assert fake_github(scenario) == (None, 0)
+
+
+def test_claim_keeps_retrying_a_busy_file(fake_github, monkeypatch):
+    state = new_state()
+    monkeypatch.setattr(main, "CLAIM_RETRY_DELAY", 0)
+
+    async def scenario(fake):
+        path = state.config.events_file
+        fake.write(path, json.dumps([remote_event()]).encode())
+        cas = state.events_commits.compare_and_swap
+        conflicts = iter(range(5))
+
+        async def busy(snapshot, message):
+            if next(conflicts, None) is not None:
+                # Someone commits an unrelated change just before us
+                other = json.loads(fake.files[path]) + [remote_event(id="x")]
+                fake.write(path, json.dumps(other).encode())
+            return await cas(snapshot, message)
+
+        monkeypatch.setattr(state.events_commits, "compare_and_swap", busy)
+        return await main.claim_announcement(state, "quiz")
+
+    claimed = fake_github(scenario)
+    assert claimed is not None and claimed["started"]
+
+
+def test_claim_gives_up_after_the_grace_period(fake_github, monkeypatch,
+                                                capsys):
+    state = new_state()
+    monkeypatch.setattr(main, "CLAIM_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(main, "ANNOUNCE_TAKEOVER_GRACE", 0.05)
+
+    async def scenario(fake):
+        fake.write(state.config.events_file,
+                   json.dumps([remote_event()]).encode())
+
+        async def conflict(snapshot, message):
+            return main.GitHubResponse(409, {}, "")
+
+        monkeypatch.setattr(state.events_commits, "compare_and_swap",
+                            conflict)
+        return await main.claim_announcement(state, "quiz")
+
+    assert fake_github(scenario) is None
+    assert "Gave up claiming event Quiz" in capsys.readouterr().out
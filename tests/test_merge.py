@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import main
+
+START = datetime(2030, 1, 1, 18, tzinfo=timezone.utc)
+
+
+def event(event_id, **fields):
+    return {
+        "id": event_id,
+        "name": event_id,
+        "content": "",
+        "start_time": START,
+        "creator": {"id": 1, "name": "host"},
+        **fields
+    }
+
+
+def test_merge_event_takes_changes_from_both_sides():
+    base = event("a")
+    merged, conflicts = main.merge_event(base, {**base, "name": "ours"},
+                                         {**base, "content": "theirs"})
+    assert merged["name"] == "ours"
+    assert merged["content"] == "theirs"
+    assert conflicts == []
+
+
+def test_merge_event_same_field_conflict_keeps_ours():
+    base = event("a")
+    merged, conflicts = main.merge_event(base, {**base, "name": "ours"},
+                                         {**base, "name": "theirs"})
+    assert merged["name"] == "ours"
+    assert conflicts == ["name"]
+
+
+def test_merge_event_started_and_deleted_stick():
+    base = event("a")
+    merged, conflicts = main.merge_event(
+        base, {**base, "started": True, "name": "ours"},
+        {**base, "deleted": True, "name": "theirs"})
+    assert merged["started"] and merged["deleted"]
+    assert conflicts == ["name"]
+
+
+def test_merge_event_field_removed_on_one_side():
+    base = event("a", note="x")
+    local = {k: v for k, v in base.items() if k != "note"}
+    merged, _ = main.merge_event(base, local, {**base, "name": "theirs"})
+    assert "note" not in merged
+    assert merged["name"] == "theirs"
+
+
+def test_merge_events_remove_beats_edit():
+    base = [event("a"), event("b")]
+    local = [event("a", name="edited"), event("b")]
+    remote = [event("b")]
+    merged, conflicts = main.merge_events(base, local, remote)
+    assert [e["id"] for e in merged] == ["b"]
+    assert conflicts == []
+
+    merged, _ = main.merge_events(base, remote, local)
+    assert [e["id"] for e in merged] == ["b"]
+
+
+def test_merge_events_keeps_additions_from_both_sides():
+    base = [event("a")]
+    merged, _ = main.merge_events(base, base + [event("ours")],
+                                  base + [event("theirs")])
+    assert [e["id"] for e in merged] == ["a", "ours", "theirs"]
+
+
+def test_merge_events_reports_conflicts_per_event():
+    base = [event("a")]
+    merged, conflicts = main.merge_events(base, [event("a", name="ours")],
+                                          [event("a", name="theirs")])
+    assert merged[0]["name"] == "ours"
+    assert conflicts == [("a", ["name"])]
+
+
+def test_merge_waits_for_an_unreadable_base(fake_github, tmp_path):
+    store = main.EventStore("events.json", str(tmp_path / "events.local.json"),
+                            str(tmp_path / "events.journal"),
+                            str(tmp_path / "archive.jsonl"))
+    store.remote_sha = "0" * 40  # blob no longer readable
+    state = SimpleNamespace(store=store)
+
+    async def scenario(fake):
+        fake.write("events.json", b'[{"id": "archived", "name": "x", '
+                   b'"start_time": "2030-01-01T18:00:00+00:00"}]')
+        return await main.merge_remote_events(state)
+
+    assert fake_github(scenario) is None
+    assert len(store) == 0
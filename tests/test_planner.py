@@ -0,0 +1,185 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import main
+
+
+def test_missing_planner_reads_as_empty(fake_github):
+
+    async def scenario(fake):
+        planner = main.PlannerCache("eventplanner.json")
+        return await planner.get()
+
+    assert fake_github(scenario) == {}
+
+
+def test_failed_first_read_is_not_cached(fake_github, monkeypatch):
+
+    async def scenario(fake):
+        fake.write("eventplanner.json", b'{"2030-1": []}')
+        planner = main.PlannerCache("eventplanner.json")
+        request = main.github.request
+
+        async def refused(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(main.github, "request", refused)
+        try:
+            await planner.get()
+        except RuntimeError:
+            failed = True
+        else:
+            failed = False
+
+        monkeypatch.setattr(main.github, "request", request)
+        return failed, await planner.get()
+
+    failed, data = fake_github(scenario)
+    assert failed
+    assert data == {"2030-1": []}
+
+
+def test_failed_revalidation_keeps_the_last_copy(fake_github, monkeypatch):
+
+    async def scenario(fake):
+        fake.write("eventplanner.json", b'{"2030-1": []}')
+        planner = main.PlannerCache("eventplanner.json", ttl=0)
+        first = await planner.get()
+
+        async def refused(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(main.github, "request", refused)
+        return first, await planner.get()
+
+    first, second = fake_github(scenario)
+    assert first == second == {"2030-1": []}
+
+
+def test_update_reapplies_on_top_of_a_concurrent_commit(fake_github):
+
+    def claim(name):
+
+        def mutate(schedule):
+            schedule.setdefault("claims", []).append(name)
+            return True, name
+
+        return mutate
+
+    async def scenario(fake):
+        fake.write("eventplanner.json", b"{}")
+        planner = main.PlannerCache("eventplanner.json")
+        await planner.get()
+        # Someone else commits after our read
+        fake.write("eventplanner.json", b'{"claims": ["them"]}')
+        result = await planner.update(claim("us"))
+        return (result, json.loads(fake.files["eventplanner.json"]),
+                fake.calls[("PUT", "eventplanner.json")])
+
+    result, remote, puts = fake_github(scenario)
+    assert result == "us"
+    assert remote == {"claims": ["them", "us"]}
+    assert puts == 2  # 409, then the reapplied change
+
+
+def test_update_recovers_from_an_unknown_sha(fake_github):
+
+    async def scenario(fake):
+        fake.write("eventplanner.json", b'{"claims": []}')
+        planner = main.PlannerCache("eventplanner.json")
+        await planner.get()
+        main.github._versions.clear()  # PUT without a SHA gets a 422
+        await planner.update(lambda schedule: (True, schedule.update(x=1)))
+        return json.loads(fake.files["eventplanner.json"])
+
+    assert fake_github(scenario) == {"claims": [], "x": 1}
+
+
+def test_eventplanner_reports_an_unreadable_planner(fake_github, monkeypatch):
+    sent = []
+
+    async def defer(**kwargs):
+        pass
+
+    async def send(content=None, **kwargs):
+        sent.append(content)
+
+    interaction = SimpleNamespace(
+        guild_id=main.GUILD_ID,
+        response=SimpleNamespace(defer=defer),
+        followup=SimpleNamespace(send=send))
+
+    async def scenario(fake):
+        state = main.guilds[main.GUILD_ID]
+        monkeypatch.setattr(state, "planner",
+                            main.PlannerCache(state.config.planner_file))
+        monkeypatch.setattr(state, "calendar", (None, None, None))
+
+        async def refused(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(main.github, "request", refused)
+        await main.eventplanner.callback(interaction)
+
+    fake_github(scenario)
+    assert sent == [main.PLANNER_UNAVAILABLE]
+
+
+def test_generate_month_merges_a_short_last_week():
+    weeks = main.generate_month(2025, 11)
+    assert [(w["start"], w["end"]) for w in weeks] == [
+        ("2025-11-01", "2025-11-07"),
+        ("2025-11-08", "2025-11-14"),
+        ("2025-11-15", "2025-11-21"),
+        ("2025-11-22", "2025-11-30"),
+    ]
+    assert all(w["slots"] == [None, None] for w in weeks)
+    assert len(main.generate_month(2026, 2)) == 4
+    assert main.generate_month(2025, 12)[-1]["end"] == "2025-12-31"
+
+
+def test_migrate_week_converts_legacy_ranges_once():
+    week = {"range": "22-30 November 2025", "slots": ["a", None]}
+    assert main.migrate_week(week, "2025-11")
+    assert week == {
+        "start": "2025-11-22",
+        "end": "2025-11-30",
+        "slots": ["a", None]
+    }
+    assert not main.migrate_week(week, "2025-11")
+    assert main.week_label(week) == "22-30 November 2025"
+
+
+def test_calendar_week_of_and_future_weeks():
+    schedule = {
+        "2025-12": main.generate_month(2025, 12),
+        "2025-11": main.generate_month(2025, 11),
+    }
+    cal = main.PlannerCalendar(schedule)
+    assert cal.months == ["2025-11", "2025-12"]
+
+    month_key, number, week = cal.week_of(date(2025, 11, 29))
+    assert (month_key, number) == ("2025-11", 4)
+    assert week is schedule["2025-11"][3]
+    assert cal.week_of(date(2025, 12, 31))[:2] == ("2025-12", 4)
+    assert cal.week_of(date(2026, 1, 1)) is None
+
+    future = cal.future_weeks("2025-11", date(2025, 11, 14))
+    assert [number for number, _ in future] == [2, 3, 4]
+
+
+def test_find_week_slots_only_reads_the_claimed_month(monkeypatch):
+    monkeypatch.setattr(main, "PlannerCalendar", None)  # no full date index
+    schedule = {
+        "2099-2": main.generate_month(2099, 2),
+        "2020-1": main.generate_month(2020, 1),
+    }
+
+    month_key, slots = main.find_week_slots(schedule, 2, 3)
+    assert month_key == "2099-2"
+    assert slots is schedule["2099-2"][2]["slots"]
+
+    assert main.find_week_slots(schedule, 1, 1)[0] is None  # already passed
+    assert main.find_week_slots(schedule, 3, 1) == (
+        None, "❌ Invalid month index. Choose 1 to 2.")
@@ -0,0 +1,86 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import main
+
+
+def payload(message_id):
+    return SimpleNamespace(message_id=message_id, channel_id=10)
+
+
+def channel_with(messages):
+    fetched = []
+
+    async def fetch_message(message_id):
+        fetched.append(message_id)
+        return messages[message_id]
+
+    return SimpleNamespace(fetch_message=fetch_message), fetched
+
+
+def reacted(me):
+    return SimpleNamespace(reactions=[SimpleNamespace(emoji="✅", me=me)])
+
+
+def test_new_registry_records_a_cutover(tmp_path):
+    path = str(tmp_path / "messages.txt")
+    registry = main.MessageRegistry(path)
+    registry.load()
+    registry.add(registry.legacy_before + 5)
+    asyncio.run(main.disk_writer.drain())
+
+    reloaded = main.MessageRegistry(path)
+    reloaded.load()
+    assert reloaded.legacy_before == registry.legacy_before
+    assert registry.legacy_before + 5 in reloaded
+    assert reloaded.is_legacy(registry.legacy_before - 1)
+    assert not reloaded.is_legacy(registry.legacy_before + 1)
+
+
+def test_registry_without_cutover_uses_its_oldest_message(tmp_path):
+    path = tmp_path / "messages.txt"
+    path.write_text("300\n200\n")
+    registry = main.MessageRegistry(str(path))
+    registry.load()
+    assert registry.legacy_before == 200
+
+
+def test_legacy_prompts_are_checked_once(tmp_path, monkeypatch):
+    registry = main.MessageRegistry(str(tmp_path / "messages.txt"))
+    registry.legacy_before = 100
+    channel, fetched = channel_with({1: reacted(True), 2: reacted(False)})
+    monkeypatch.setattr(main, "announcement_messages", registry)
+    monkeypatch.setattr(main.bot, "get_channel", lambda channel_id: channel)
+
+    async def scenario():
+        results = []
+        for message_id in (1, 2, 1, 2, 150):
+            results.append(await main.is_prompt_message(payload(message_id)))
+        return results
+
+    assert asyncio.run(scenario()) == [True, False, True, False, False]
+    assert fetched == [1, 2]
+    assert 1 in registry
+
+
+
+def test_rejected_legacy_messages_survive_a_restart(tmp_path):
+    path = tmp_path / "messages.txt"
+    path.write_text("cutover 100\n")
+    registry = main.MessageRegistry(str(path))
+    registry.load()
+    registry.reject(2)
+    registry.reject(2)
+    asyncio.run(main.disk_writer.drain())
+
+    reloaded = main.MessageRegistry(str(path))
+    reloaded.load()
+    assert not reloaded.is_legacy(2)
+    assert reloaded.is_legacy(3)
+    assert 2 not in reloaded
+    assert path.read_text() == "cutover 100\nreject 2\n"
+
+def test_import_leaves_no_files_behind():
+    assert main.announcement_messages.legacy_before == 0
+    assert not os.path.exists(main.ANNOUNCEMENT_MESSAGES_FILE)
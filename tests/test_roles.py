@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import main
+
+
+class Member:
+
+    def __init__(self, member_id):
+        self.id = member_id
+        self.display_name = str(member_id)
+        self.roles = set()
+
+    def get_role(self, role_id):
+        return role_id if role_id in self.roles else None
+
+    async def add_roles(self, role, reason=None):
+        await asyncio.sleep(0.005)
+        self.roles.add(role.id)
+
+
+def test_failing_progress_does_not_stop_the_run():
+    members = {i: Member(i) for i in range(40)}
+    guild = SimpleNamespace(get_member=members.get)
+    role = SimpleNamespace(id=7, name="Participant")
+    calls = []
+
+    async def progress(text):
+        calls.append(text)
+        raise RuntimeError("Invalid Webhook Token")
+
+    async def scenario():
+        op = main.BulkRoleOperation("test-progress", guild, role, "add")
+        await op.run(list(members), progress=progress, progress_interval=0.01)
+        return op, await op.resumed_ids()
+
+    op, resumed = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert op.done == 40 and not op.failed
+    assert all(m.roles == {7} for m in members.values())
+    assert resumed == []
+
+
+class Role(SimpleNamespace):
+    pass
+
+
+def fake_guild(guild_id, roles):
+    by_id = {role.id: role for role in roles}
+    return SimpleNamespace(id=guild_id, roles=roles, get_role=by_id.get)
+
+
+def test_participant_role_comes_from_the_configured_id():
+    configured = Role(id=5, name="Members")
+    named = Role(id=6, name="Participant")
+    resolver = main.GuildResolver({1: 5})
+
+    guild = fake_guild(1, [configured, named])
+    resolver.refresh_roles(guild)
+    assert resolver.participant_role(guild) is configured
+
+    other = fake_guild(2, [configured, named])
+    resolver.refresh_roles(other)
+    assert resolver.participant_role(other) is named
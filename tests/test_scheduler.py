@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import main
+
+
+def soon(seconds):
+    return datetime.now(tz=timezone.utc) + timedelta(seconds=seconds)
+
+
+def run_scheduler(setup, wait=0.3, **kwargs):
+    fired = []
+
+    async def callback(event_id):
+        fired.append((event_id, datetime.now(tz=timezone.utc)))
+
+    async def scenario():
+        scheduler = main.AnnouncementScheduler(callback, **kwargs)
+        await setup(scheduler)
+        await asyncio.sleep(wait)
+        return scheduler
+
+    return asyncio.run(scenario()), fired
+
+
+def test_fires_in_start_order():
+
+    async def setup(scheduler):
+        scheduler.schedule("late", soon(0.15))
+        scheduler.schedule("early", soon(0.1))
+
+    scheduler, fired = run_scheduler(setup)
+    assert [event_id for event_id, _ in fired] == ["early", "late"]
+    assert len(scheduler) == 0
+
+
+def test_reschedule_to_an_earlier_time():
+    deadline = {}
+
+    async def setup(scheduler):
+        scheduler.schedule("a", soon(10))
+        await asyncio.sleep(0.02)  # timer is asleep on the old deadline
+        deadline["a"] = soon(0.1)
+        assert scheduler.schedule("a", deadline["a"])
+        assert not scheduler.schedule("a", deadline["a"])
+
+    _, fired = run_scheduler(setup)
+    assert [event_id for event_id, _ in fired] == ["a"]
+    assert fired[0][1] >= deadline["a"]
+
+
+def test_reschedule_later_does_not_fire_early():
+
+    async def setup(scheduler):
+        scheduler.schedule("a", soon(0.1))
+        scheduler.schedule("a", soon(10))
+
+    scheduler, fired = run_scheduler(setup)
+    assert fired == []
+    assert "a" in scheduler
+
+
+def test_cancel():
+
+    async def setup(scheduler):
+        scheduler.schedule("a", soon(0.1))
+        scheduler.schedule("b", soon(0.12))
+        assert scheduler.cancel("a")
+        assert not scheduler.cancel("a")
+
+    scheduler, fired = run_scheduler(setup)
+    assert [event_id for event_id, _ in fired] == ["b"]
+    assert "a" not in scheduler
+
+
+def test_many_cancellations_compact_the_heap():
+
+    async def setup(scheduler):
+        for i in range(200):
+            scheduler.schedule(str(i), soon(60 + i))
+        for i in range(150):
+            scheduler.cancel(str(i))
+
+    scheduler, _ = run_scheduler(setup, wait=0)
+    assert len(scheduler) == 50
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 64
@@ -0,0 +1,192 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import main
+
+
+def make_store(tmp_path):
+    return main.EventStore(str(tmp_path / "events.json"),
+                           str(tmp_path / "events.local.json"),
+                           str(tmp_path / "events.journal"),
+                           str(tmp_path / "events_archive.local.jsonl"))
+
+
+def event(event_id, **fields):
+    return {
+        "id": event_id,
+        "name": event_id,
+        "start_time": "2030-01-01T18:00:00+00:00",
+        "creator": {"id": 1, "name": "host"},
+        **fields
+    }
+
+
+def drain():
+    asyncio.run(main.disk_writer.drain())
+
+
+def write_journal(store, records, tail=""):
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+
+
+def test_journal_replay(tmp_path):
+    store = make_store(tmp_path)
+    with open(store.checkpoint_path, "w", encoding="utf-8") as f:
+        json.dump([event("a"), event("b")], f)
+    write_journal(store, [
+        {"op": "checkpoint", "v": 4, "upto": 4, "sha": "s1"},
+        {"op": "put", "v": 5, "event": event("c")},
+        {"op": "delete", "v": 6, "id": "a"},
+        {"op": "put", "v": 7, "event": event("b", name="renamed")},
+        {"op": "replicated", "upto": 6, "sha": "s2"},
+    ])
+    store.load()
+
+    assert sorted(e["id"] for e in store.all()) == ["b", "c"]
+    assert store.get("b")["name"] == "renamed"
+    assert store.version == 7
+    assert store.replicated_version == 6
+    assert store.remote_sha == "s2"
+    assert store.pending
+    now = datetime(2029, 1, 1, tzinfo=timezone.utc)
+    assert [e["id"] for e in store.upcoming_by(1, now)] == ["b", "c"]
+
+
+def test_torn_journal_tail_is_ignored(tmp_path):
+    store = make_store(tmp_path)
+    write_journal(store, [
+        {"op": "put", "v": 1, "event": event("a")},
+    ], tail='{"op": "put", "v": 2, "event": {"id": "b", "na')
+    store.load()
+
+    assert [e["id"] for e in store.all()] == ["a"]
+    assert store.version == 1
+
+    # The store keeps working and a reload sees the new record
+    store.put(main.parse_event_times([event("c")])[0])
+    drain()
+    reloaded = make_store(tmp_path)
+    reloaded.load()
+    assert sorted(e["id"] for e in reloaded.all()) == ["a", "c"]
+
+
+def test_first_start_seeds_from_checkout_without_pending(tmp_path):
+    store = make_store(tmp_path)
+    legacy = {k: v for k, v in event("x").items() if k != "id"}
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump([legacy], f)
+    store.load()
+    drain()
+
+    assert len(store) == 1
+    assert not store.pending
+    assert store.remote_sha is None
+    with open(store.path, encoding="utf-8") as f:
+        assert json.load(f) == [legacy]  # the tracked copy is never rewritten
+
+    reloaded = make_store(tmp_path)
+    reloaded.load()
+    assert [e["id"] for e in reloaded.all()] == [e["id"] for e in store.all()]
+
+
+def test_checkpoint_resets_the_journal(tmp_path):
+    store = make_store(tmp_path)
+    store.load()
+    for i in range(3):
+        store.put(main.parse_event_times([event(str(i))])[0])
+    store.mark_replicated(store.version, "sha")
+    store.checkpoint()
+    drain()
+
+    with open(store.journal_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+    reloaded = make_store(tmp_path)
+    reloaded.load()
+    assert len(reloaded) == 3
+    assert not reloaded.pending
+    assert reloaded.remote_sha == "sha"
+
+
+def test_legacy_ids_are_stable_across_copies():
+    legacy = {
+        "name": "Quiz",
+        "start_time": "2030-01-01T18:00:00+00:00",
+        "creator": {"id": 1, "name": "host"}
+    }
+    first = [dict(legacy), dict(legacy)]
+    second = main.parse_event_times([dict(legacy), dict(legacy)])
+    assert len(main.ensure_event_ids(first)) == 2
+    main.ensure_event_ids(second)
+    assert [e["id"] for e in first] == [e["id"] for e in second]
+    assert first[0]["id"] != first[1]["id"]
+
+
+def test_disk_writer_keeps_submit_order(tmp_path):
+    path = str(tmp_path / "log")
+    for i in range(100):
+        main.disk_writer.submit(main._append_fsync, path, b"%d\n" % i)
+    drain()
+    with open(path, "rb") as f:
+        assert f.read().split() == [b"%d" % i for i in range(100)]
+
+
+def test_merge_archive_appends_only_missing_events(tmp_path):
+    store = make_store(tmp_path)
+    store._append_archive([json.dumps(event("local")).encode(),
+                           json.dumps(event("both")).encode()])
+    remote = b"\n".join([
+        json.dumps(event("old")).encode(),
+        json.dumps(event("both")).encode(),
+        json.dumps(event("old")).encode(),
+    ]) + b"\n"
+
+    assert store.merge_archive(remote) == 1
+    assert store.merge_archive(remote) == 0
+    ids = [json.loads(line)["id"] for line in store.read_archive().splitlines()]
+    assert ids == ["local", "both", "old"]
+
+    drain()
+    reloaded = make_store(tmp_path)
+    reloaded.load()
+    assert reloaded.read_archive() == store.read_archive()
+
+
+def test_creator_index_follows_in_place_edits(tmp_path):
+    store = make_store(tmp_path)
+    now = datetime(2029, 1, 1, tzinfo=timezone.utc)
+    a, b = main.parse_event_times([event("a"), event("b")])
+    b["start_time"] = b["start_time"].replace(hour=20)
+    store.put(a)
+    store.put(b)
+    assert [e["id"] for e in store.upcoming_by(1, now)] == ["a", "b"]
+
+    # Edits mutate the stored dict before put(), as the edit modal does
+    a["start_time"] = a["start_time"].replace(hour=21)
+    store.put(a)
+    assert [e["id"] for e in store.upcoming_by(1, now)] == ["b", "a"]
+
+    b["creator"] = {"id": 2, "name": "other"}
+    store.put(b)
+    assert [e["id"] for e in store.upcoming_by(1, now)] == ["a"]
+    assert [e["id"] for e in store.upcoming_by(2, now)] == ["b"]
+
+    a["started"] = True
+    store.put(a)
+    store.delete("b")
+    assert store.upcoming_by(1, now) == []
+    assert store.upcoming_by(2, now) == []
+    assert store._by_creator == {} and store._index_keys == {}
+
+
+def test_creator_index_only_lists_events_after_now(tmp_path):
+    store = make_store(tmp_path)
+    a, b = main.parse_event_times([event("a"), event("b")])
+    b["start_time"] = b["start_time"].replace(year=2031)
+    store.put(a)
+    store.put(b)
+    after_a = a["start_time"]
+    assert [e["id"] for e in store.upcoming_by(1, after_a)] == ["b"]
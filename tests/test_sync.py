@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import main
+
+START = datetime.now(tz=timezone.utc) + timedelta(days=1)
+
+
+def event(event_id, **fields):
+    return {
+        "id": event_id,
+        "name": event_id,
+        "content": "",
+        "start_time": START,
+        "creator": {"id": 1, "name": "host"},
+        **fields
+    }
+
+
+def test_diff_events():
+    old = [event("kept"), event("moved"), event("edited"), event("gone"),
+           event("started")]
+    new = [
+        event("kept"),
+        event("moved", start_time=START - timedelta(hours=1)),
+        event("edited", content="new text"),
+        event("started", started=True),
+        event("added")
+    ]
+    added, removed, retimed, changed = main.diff_events(old, new)
+    assert [e["id"] for e in added] == ["added"]
+    assert [e["id"] for e in removed] == ["gone"]
+    assert sorted(e["id"] for e in retimed) == ["moved", "started"]
+    assert [e["id"] for e in changed] == ["edited"]
+
+
+def test_apply_event_diff_only_touches_changed_timers():
+    old = [event("kept"), event("moved"), event("gone"), event("started")]
+    new = [
+        event("kept", content="edited"),
+        event("moved", start_time=START + timedelta(hours=1)),
+        event("started", started=True),
+        event("added"),
+        event("past", start_time=START - timedelta(days=2)),
+    ]
+
+    async def scenario():
+        state = SimpleNamespace(
+            scheduler=main.AnnouncementScheduler(lambda event_id: None))
+        main.apply_event_diff(state, [], old)
+        scheduled = []
+        schedule = state.scheduler.schedule
+
+        def spy(event_id, start_time):
+            scheduled.append(event_id)
+            return schedule(event_id, start_time)
+
+        state.scheduler.schedule = spy
+        main.apply_event_diff(state, old, new)
+        return state.scheduler, scheduled
+
+    scheduler, scheduled = asyncio.run(scenario())
+    assert sorted(scheduled) == ["added", "moved"]
+    assert scheduler._deadlines == {
+        "kept": START,
+        "moved": START + timedelta(hours=1),
+        "added": START,
+    }
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import main
+
+
+def make_state(tmp_path):
+    store = main.EventStore(str(tmp_path / "events.json"),
+                            str(tmp_path / "events.local.json"),
+                            str(tmp_path / "events.journal"),
+                            str(tmp_path / "archive.jsonl"))
+    state = SimpleNamespace(store=store, config=None)
+    state.upcoming = main.UpcomingEventsCache(state)
+    return state
+
+
+def event(event_id, start):
+    return {
+        "id": event_id,
+        "name": event_id,
+        "start_time": start,
+        "creator": {"id": 1, "name": "host"}
+    }
+
+
+def counting_render():
+    calls = []
+
+    def render(upcoming, config):
+        calls.append([e["id"] for e in upcoming])
+        return [object()]
+
+    return render, calls
+
+
+def test_pages_are_rendered_once_per_store_version(tmp_path):
+    state = make_state(tmp_path)
+    later = datetime.now(tz=timezone.utc) + timedelta(days=1)
+    render, calls = counting_render()
+
+    first = state.upcoming.pages(render)  # empty store on first use
+    assert state.upcoming.pages(render) is first
+    assert calls == [[]]
+
+    state.store.put(event("b", later + timedelta(hours=1)))
+    state.store.put(event("a", later))
+    pages = state.upcoming.pages(render)
+    assert pages is not first
+    assert state.upcoming.pages(render) is pages
+    assert calls == [[], ["a", "b"]]
+
+
+def test_cache_drops_once_the_soonest_event_starts(tmp_path):
+    state = make_state(tmp_path)
+    now = datetime.now(tz=timezone.utc)
+    state.store.put(event("soon", now + timedelta(seconds=0.05)))
+    state.store.put(event("later", now + timedelta(days=1)))
+    render, calls = counting_render()
+
+    state.upcoming.pages(render)
+    time.sleep(0.06)
+    state.upcoming.pages(render)
+    assert calls == [["soon", "later"], ["later"]]
+    assert [e["id"] for e in state.upcoming.upcoming()] == ["later"]
+
+
+def test_renderers_are_cached_separately(tmp_path):
+    state = make_state(tmp_path)
+    events_render, events_calls = counting_render()
+    end_render, end_calls = counting_render()
+    state.upcoming.pages(events_render)
+    state.upcoming.pages(end_render)
+    state.upcoming.pages(events_render)
+    assert len(events_calls) == len(end_calls) == 1
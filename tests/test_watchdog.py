@@ -0,0 +1,27 @@
+import sys
+
+import discord
+from discord import app_commands
+
+import main
+
+
+def test_blocking_handler_names_commands_of_every_guild(monkeypatch):
+    other = discord.Object(id=main.GUILD_ID + 1)
+
+    async def slow(interaction: discord.Interaction):
+        return sys._getframe()
+
+    command = app_commands.Command(name="slow", description="Blocks",
+                                   callback=slow)
+    main.bot.tree.add_command(command, guild=other)
+    monkeypatch.setattr(main, "guilds", {main.GUILD_ID: None, other.id: None})
+    try:
+        coro = slow(None)
+        try:
+            coro.send(None)
+        except StopIteration as done:
+            frame = done.value
+        assert main.blocking_handler(frame) == "/slow"
+    finally:
+        main.bot.tree.remove_command("slow", guild=other)
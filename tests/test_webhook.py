@@ -0,0 +1,24 @@
+import json
+import urllib.parse
+
+import pytest
+
+import main
+
+PUSH = {"ref": "refs/heads/main", "commits": [{"modified": ["events.json"]}]}
+
+
+def test_json_delivery():
+    body = json.dumps(PUSH).encode()
+    assert main.webhook_payload("application/json", body) == PUSH
+
+
+def test_form_encoded_delivery():
+    body = urllib.parse.urlencode({"payload": json.dumps(PUSH)}).encode()
+    assert main.webhook_payload("application/x-www-form-urlencoded",
+                                body) == PUSH
+
+
+def test_form_without_payload_is_rejected():
+    with pytest.raises(ValueError):
+        main.webhook_payload("application/x-www-form-urlencoded", b"a=1")